@@ -1,79 +1,54 @@
-import fastf1
 import numpy as np
 import matplotlib.pyplot as plt
 import pandas as pd
-
-def TopSpeedVSAvgSpeed(Year: int, GrandPrix: str, Session: str):
+from visualizations.data_requirements import uses, load_for
+from visualizations.fuel import fuel_model_for, corrected_lap_times
+from visualizations.telemetry import lap_speed_table
+
+# 2025 team colours
+team_colors = {
+    "Red Bull": "#0600EF",
+    "Ferrari": "#DC0000",
+    "Mercedes": "#00D2BE",
+    "McLaren": "#FF8700",
+    "Aston Martin": "#006F62",
+    "Alpine": "#0090FF",
+    "RB": "#6692FF",
+    "Sauber": "#52E252",
+    "Williams": "#00A0DE",
+    "Haas": "#B6BABD"
+}
+
+@uses("laps", "car_data")
+def TeamSpeedTable(Year: int, GrandPrix: str, Session: str) -> pd.DataFrame:
 
     # -------------------------------
     # Load session
     # -------------------------------
-    session = fastf1.get_session(Year, GrandPrix, Session)
-    session.load()
+    session = load_for(TeamSpeedTable, Year, GrandPrix, Session)
 
     # Pick clean laps
     laps = session.laps.pick_quicklaps()
-    teams = laps["Team"].unique()
-
-    # For storing results
-    avg_speeds = {}
-    top_speeds = {}
-
-    # 2025 team colours
-    team_colors = {
-        "Red Bull": "#0600EF",
-        "Ferrari": "#DC0000",
-        "Mercedes": "#00D2BE",
-        "McLaren": "#FF8700",
-        "Aston Martin": "#006F62",
-        "Alpine": "#0090FF",
-        "RB": "#6692FF",
-        "Sauber": "#52E252",
-        "Williams": "#00A0DE",
-        "Haas": "#B6BABD"
-    }
 
     # -------------------------------
     # Compute speeds
     # -------------------------------
-    for team in teams:
-        team_laps = laps[laps["Team"] == team]
-        drivers = team_laps["Driver"].unique()
-
-        lap_avg_speeds = []
-        team_top_speed_list = []
-
-        for drv in drivers:
-            driver_laps = team_laps[team_laps["Driver"] == drv]
-
-            for _, lap in driver_laps.iterrows():
-
-                tel = lap.get_telemetry()
-                if tel.empty:
-                    continue
-
-                speed = tel["Speed"].values              # km/h
-                time = tel["Time"].values               # numpy.timedelta64 array
-
-                # Convert timedelta64 → seconds
-                t = time.view("timedelta64[ns]").astype(float) / 1e9
-
-                if len(t) < 2:
-                    continue
-
-                dt = np.diff(t)
-                v = speed[:-1]
-
-                # Numerical integration: avg speed = ∫v dt / T
-                avg_speed = np.sum(v * dt) / (t[-1] - t[0])
-                lap_avg_speeds.append(avg_speed)
+    # Mean and top speed of every lap at once
+    lap_speeds = lap_speed_table(session, laps)
+
+    # Teams: mean of their laps' average speeds, best top speed
+    return (
+        lap_speeds.groupby("Team")
+        .agg(AvgSpeed=("MeanSpeed", "mean"), TopSpeed=("TopSpeed", "max"), Laps=("MeanSpeed", "count"))
+        .reset_index()
+    )
 
-                # Top speed of lap
-                team_top_speed_list.append(speed.max())
+@uses("laps", "car_data")
+def TopSpeedVSAvgSpeed(Year: int, GrandPrix: str, Session: str):
 
-        # Store results
-        avg_speeds[team] = np.mean(lap_avg_speeds) if lap_avg_speeds else np.nan
-        top_speeds[team] = np.max(team_top_speed_list) if team_top_speed_list else np.nan
+    speeds = TeamSpeedTable(Year, GrandPrix, Session).set_index("Team")
+    avg_speeds = speeds["AvgSpeed"].to_dict()
+    top_speeds = speeds["TopSpeed"].to_dict()
 
     # -------------------------------
     # Plot
@@ -132,14 +107,15 @@ def TopSpeedVSAvgSpeed(Year: int, GrandPrix: str, Session: str):
 
 #TopSpeedVSAvgSpeed(2025,"Britain","Q")
 
+@uses("laps")
 def FullRacePaceAnalysis(
         year: int,
         grand_prix: str,
         driver_A: str,
         driver_B: str,
-        fuel_load_start: float = 105.0,
-        fuel_per_lap: float = 1.6,
-        delta_per_kg: float = 0.035
+        fuel_load_start: float = None,
+        fuel_per_lap: float = None,
+        delta_per_kg: float = None
     ):
     """
     Compares race pace between two drivers:
@@ -149,6 +125,7 @@ def FullRacePaceAnalysis(
     - Driver B: dotted lines
     - Raw laps = faint dots
     - Corrected laps = styled lines
+    - Fuel constants default to the race's fitted fuel model
     """
 
     plt.style.use("dark_background")
@@ -163,8 +140,10 @@ def FullRacePaceAnalysis(
 
     line_styles = {driver_A: "solid", driver_B: "dotted"}
 
-    session = fastf1.get_session(year, grand_prix, "R")
-    session.load()
+    session = load_for(FullRacePaceAnalysis, year, grand_prix, "R")
+    fuel_model = fuel_model_for(session).with_overrides(
+        sec_per_kg=delta_per_kg, start_fuel_kg=fuel_load_start, fuel_per_lap_kg=fuel_per_lap
+    )
 
     plt.figure(figsize=(15, 8))
 
@@ -180,11 +159,7 @@ def FullRacePaceAnalysis(
         lap_times = laps["LapTime"].dt.total_seconds().to_numpy()
         compounds = laps["Compound"].fillna("UNKNOWN").to_numpy()
 
-        fuel_remaining = np.clip(
-            fuel_load_start - lap_numbers * fuel_per_lap, 0, None
-        )
-        fuel_correction = fuel_remaining * delta_per_kg
-        corrected = lap_times - fuel_correction
+        corrected = corrected_lap_times(laps, fuel_model)
 
         print(f"\n====== DRIVER {driver} ======")
         print(f"Avg raw pace:        {np.mean(lap_times):.3f}s")
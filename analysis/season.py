@@ -0,0 +1,156 @@
+import datetime
+import pickle
+
+import pandas as pd
+
+from visualizations.data_requirements import uses, load_for
+from visualizations.disk_cache import DiskCache
+from visualizations.executor import get_section_executor, PROCESS
+from visualizations.fuel import fuel_model_for, corrected_lap_times
+from visualizations.metrics import count_cache
+from visualizations.sessions import get_event_schedule, session_is_historical
+
+
+# -------------------- Constants --------------------
+
+# Tables in every round summary, and in the merged season summary
+SEASON_TABLES = ["results", "team_pace", "quali_gaps"]
+
+# Bump whenever a round summary changes shape, orphaning the cached ones
+SEASON_VERSION = "2"
+
+# Summaries of finished rounds, so a new race only computes that round
+round_cache = DiskCache("season", version=SEASON_VERSION, suffix=".pkl")
+
+
+# -------------------- Per round --------------------
+
+def _race_results(race) -> pd.DataFrame:
+    results = race.results
+    return pd.DataFrame({
+        "Driver": results["Abbreviation"].to_numpy(),
+        "Team": results["TeamName"].to_numpy(),
+        "Position": pd.to_numeric(results["Position"], errors="coerce").to_numpy(),
+        "GridPosition": pd.to_numeric(results["GridPosition"], errors="coerce").to_numpy(),
+        "Points": pd.to_numeric(results["Points"], errors="coerce").to_numpy(),
+        "Status": results["Status"].to_numpy(),
+    })
+
+
+def _team_pace(race) -> pd.DataFrame:
+    """Median fuel corrected race pace per team and its gap to the quickest"""
+    laps = race.laps.pick_quicklaps()
+    pace = pd.DataFrame({
+        "Team": laps["Team"].to_numpy(),
+        "Pace": corrected_lap_times(laps, fuel_model_for(race)),
+    }).dropna()
+
+    pace = pace.groupby("Team")["Pace"].median().sort_values().reset_index()
+    fastest = pace["Pace"].min()
+    pace["GapPct"] = (pace["Pace"] - fastest) / fastest * 100
+    return pace
+
+
+def _quali_gaps(quali) -> pd.DataFrame:
+    """Each driver's best qualifying lap and its gap to pole"""
+    # Personal bests only: a deleted lap (track limits) never counts
+    laps = quali.laps
+    laps = laps.loc[(laps["IsPersonalBest"] == True) & (laps["Deleted"] != True)]
+    laps = pd.DataFrame({
+        "Driver": laps["Driver"].to_numpy(),
+        "Team": laps["Team"].to_numpy(),
+        "LapTime": laps["LapTime"].dt.total_seconds().to_numpy(),
+    }).dropna()
+
+    best = laps.loc[laps.groupby("Driver")["LapTime"].idxmin()].sort_values("LapTime").reset_index(drop=True)
+    pole = best["LapTime"].min()
+    best["Gap"] = best["LapTime"] - pole
+    best["GapPct"] = best["Gap"] / pole * 100
+    return best
+
+
+# Messages mark deleted laps, which _quali_gaps leaves out
+@uses("laps", "results", "messages")
+def round_summary(year: int, event_name: str) -> dict:
+    """Results, team pace and qualifying gaps of one round.
+
+    Runs in the render process pool, so it only returns plain DataFrames.
+    """
+    race = load_for(round_summary, year, event_name, "R")
+    quali = load_for(round_summary, year, event_name, "Q")
+
+    return {
+        "results": _race_results(race),
+        "team_pace": _team_pace(race),
+        "quali_gaps": _quali_gaps(quali),
+    }
+
+
+# -------------------- Season --------------------
+
+def season_rounds(year: int) -> pd.DataFrame:
+    """RoundNumber and EventName of every round of ``year`` that has been raced"""
+    schedule = get_event_schedule(year, include_testing=False)
+    raced = schedule["EventDate"] < pd.Timestamp(datetime.datetime.now())
+    return schedule.loc[raced, ["RoundNumber", "EventName"]].reset_index(drop=True)
+
+
+def season_summary(year: int, rounds=None) -> dict:
+    """Every round's summary merged into season tables, ``{table: DataFrame}``.
+
+    Rounds missing from the cache are computed concurrently in the process
+    pool; finished ones are then cached, so only new rounds cost a load.
+    Every row carries its RoundNumber and EventName.
+    """
+    if rounds is None:
+        rounds = season_rounds(year)
+
+    summaries = {}
+    pending = {}
+    executor = get_section_executor()
+    for round_number, event_name in zip(rounds["RoundNumber"], rounds["EventName"]):
+        key = (int(year), int(round_number))
+        cached = round_cache.get(key)
+        count_cache(round_cache.name, cached is not None)
+        if cached is not None:
+            summaries[round_number] = pickle.loads(cached)
+        else:
+            pending[round_number] = (key, event_name, executor.submit(PROCESS, round_summary, year, event_name))
+
+    for round_number, (key, event_name, future) in pending.items():
+        try:
+            summary = future.result()
+        except Exception as e:
+            # Cancelled or not yet published rounds are left out
+            print(f"Skipping round {round_number} ({event_name}): {e}")
+            continue
+        summaries[round_number] = summary
+        if session_is_historical(year, event_name, "R"):
+            round_cache.put(key, pickle.dumps(summary, protocol=pickle.HIGHEST_PROTOCOL))
+
+    events = dict(zip(rounds["RoundNumber"], rounds["EventName"]))
+    season = {}
+    for table in SEASON_TABLES:
+        frames = [
+            summaries[round_number][table].assign(RoundNumber=round_number, EventName=events[round_number])
+            for round_number in sorted(summaries)
+        ]
+        season[table] = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return season
+
+
+def season_team_pace(season: dict) -> pd.DataFrame:
+    """Team x round matrix of race pace gaps (%) to the quickest team"""
+    return season["team_pace"].pivot_table(index="Team", columns="RoundNumber", values="GapPct")
+
+
+def season_quali_gaps(season: dict) -> pd.DataFrame:
+    """Team x round matrix of the team's best qualifying gap (%) to pole"""
+    return season["quali_gaps"].pivot_table(index="Team", columns="RoundNumber", values="GapPct", aggfunc="min")
+
+
+def season_points(season: dict) -> pd.DataFrame:
+    """Driver x round race points with a Total column, best first"""
+    points = season["results"].pivot_table(index="Driver", columns="RoundNumber", values="Points", aggfunc="sum", fill_value=0)
+    points["Total"] = points.sum(axis=1)
+    return points.sort_values("Total", ascending=False)
@@ -1,26 +1,222 @@
-from flask import Flask, render_template, request, url_for, jsonify
-import fastf1
-import numpy as np
-import pandas as pd
-import plotly.graph_objects as go
-from visualizations.info import RaceResults, DriverTimingsFP, drivers_championship_table, constructors_championship_table, find_next_race_info, DriverTimingsQuali, DriverTimingsQualiSession, find_track_image
-from visualizations.plots import (SpeedAcrossQualiLap,RacePOSChange,RaceLapTimePlot,TeamPaceComp,BrakePressure,ThrottleVSBrakePressure,DriverVSDriverStats,TyreStrategies,DriverLapTimes,DriverReactionTimes)
-from visualizations.race import combined_plotly_race_dashboard, driver_vs_driver_pace_plot as dvdp_plot
-from visualizations.lap_animation import DriverTelemetryVisualised, DriverVSDriverQuali
-
-# Enable cache
-fastf1.Cache.enable_cache("C:/Users/vivaa/F1/f1_dashboard/cache")
-
-app = Flask(__name__)
-
-@app.route('/', methods=['GET'])
+from flask import Blueprint, Flask, current_app, render_template, request, url_for, jsonify, g, send_file, stream_with_context
+import functools
+from concurrent.futures import as_completed
+import importlib
+import os
+import sys
+import time
+from visualizations.disk_cache import content_etag
+from visualizations.compression import pick_encoding
+from visualizations.data_requirements import load_page
+from visualizations.fastf1_cache import DEFAULT_CACHE_DIR, configure_fastf1_cache
+from visualizations.sessions import session_load_stats, session_is_historical
+from visualizations.executor import run_sections, submit_sections
+from visualizations.metrics import (span, start_request, request_spans, request_seconds, server_timing, prometheus_text,
+                                    request_collector, resume_request)
+from visualizations.profiling import profile_call, profile_path, list_profiles
+
+# Only the light modules above load with the app. FastF1, pandas, plotly,
+# matplotlib and the view modules built on them are imported by the first
+# request that needs them (see lazy), so a worker is up in well under a
+# second and pages that don't draw anything never pay for matplotlib.
+
+# Browser cache lifetime of responses that never change (one year)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+DEFAULT_CONFIG = {
+    # FastF1's HTTP cache (F1_CACHE_DIR, or cache/fastf1 in the repo)
+    "FASTF1_CACHE_DIR": DEFAULT_CACHE_DIR,
+    # Race dashboard figures are fetched as JSON after the page has loaded,
+    # F1_RACE_DASHBOARD=inline embeds them in the page as before
+    "RACE_DASHBOARD_INLINE": os.environ.get("F1_RACE_DASHBOARD", "lazy") == "inline",
+    # F1_PROFILING=1 lets a request to a profiled route ask for a profile
+    # with ?profile=cpu, memory or all (also as a form field)
+    "PROFILING": os.environ.get("F1_PROFILING", "0") == "1",
+    # Results pages are streamed: the page first, then each section as it
+    # finishes. F1_STREAM_RESULTS=0 sends them in one piece as before
+    "STREAM_RESULTS": os.environ.get("F1_STREAM_RESULTS", "1") == "1",
+}
+
+# What a streamed section shows when it failed
+SECTION_ERROR_HTML = '<div class="deferred failed">This section could not be loaded.</div>'
+
+PROFILE_MODES = {"cpu": (True, False), "memory": (False, True), "all": (True, True), "1": (True, True)}
+
+bp = Blueprint("dashboard", __name__)
+
+# module -> seconds its first import took, and the app's own boot time
+_import_seconds = {}
+_boot = {}
+
+
+# -------------------- Lazy imports --------------------
+
+def lazy(module: str):
+    """``module``, imported on first use and timed as ``import.<module>``"""
+    loaded = sys.modules.get(module)
+    if loaded is not None:
+        return loaded
+    start = time.perf_counter()
+    with span(f"import.{module}"):
+        loaded = importlib.import_module(module)
+    _import_seconds.setdefault(module, time.perf_counter() - start)
+    return loaded
+
+
+@functools.lru_cache(maxsize=None)
+def plotlyjs_version() -> str:
+    # Figure JSON uses plotly.js' typed array encoding, so pages load the
+    # plotly.js release that matches the installed plotly
+    return lazy("plotly.offline").get_plotlyjs_version()
+
+
+# -------------------- App --------------------
+
+def create_app(config: dict = None) -> Flask:
+    """Build the dashboard app; ``config`` overrides DEFAULT_CONFIG"""
+    start = time.perf_counter()
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    app.config.update(config or {})
+
+    configure_fastf1_cache(app.config["FASTF1_CACHE_DIR"])
+    app.jinja_env.globals["plotlyjs_version"] = plotlyjs_version
+    app.register_blueprint(bp)
+
+    _boot["create_app_seconds"] = time.perf_counter() - start
+    app.logger.debug("App created in %.1f ms", _boot["create_app_seconds"] * 1000)
+    return app
+
+
+@bp.before_app_request
+def start_timing():
+    g.request_start = time.perf_counter()
+    start_request()
+
+@bp.after_app_request
+def add_server_timing(response):
+    # Session load, view, render and template time of this request
+    total = time.perf_counter() - g.request_start
+    timing = server_timing(request_spans(), total)
+    if not g.get("streamed_page"):
+        request_seconds.observe(request.endpoint or "unknown", total)
+    elif not g.get("stream_done"):
+        # Headers go out before a streamed page's sections run, so this only
+        # covers the page shell; timed_stream records the whole request
+        timing += ', stream;desc="page shell only"'
+    response.headers["Server-Timing"] = timing
+    return response
+
+def render_page(template, **context):
+    with span("render_template"):
+        return render_template(template, **context)
+
+def render_block(template, block, **context):
+    # One {% block %} of a page, rendered on its own
+    current_app.update_template_context(context)
+    page = current_app.jinja_env.get_template(template)
+    with span("render_template"):
+        return "".join(page.blocks[block](page.new_context(context)))
+
+def stream_page(template, load, sections, context):
+    # The page first, with a placeholder for every section (see the blocks
+    # in the templates), then each section once it is done, slowest last
+    head, body_end, tail = render_page(template, **context).rpartition("</body>")
+    yield head
+
+    try:
+        load_page(*load)
+        futures = submit_sections(sections)
+    except Exception:
+        current_app.logger.exception("Loading %s %s %s failed", *load[:3])
+        futures = {}
+        for name in sections:
+            yield f'<template id="section-{name}">{SECTION_ERROR_HTML}</template><script>fillSection("{name}")</script>\n'
+
+    names = {future: name for name, future in futures.items()}
+    for future in as_completed(names):
+        name = names[future]
+        try:
+            html = render_block(template, name, **context, **{name: future.result()})
+        except Exception:
+            current_app.logger.exception("Section %s of %s failed", name, template)
+            html = SECTION_ERROR_HTML
+        yield f'<template id="section-{name}">{html}</template><script>fillSection("{name}")</script>\n'
+
+    yield body_end + tail
+
+def timed_stream(chunks, endpoint, start, collector):
+    # A streamed page's request ends with its last chunk, long after
+    # after_app_request: its histogram entry is recorded here instead, and
+    # its full Server-Timing (too late for a header) is logged
+    resume_request(collector)
+    try:
+        yield from chunks
+    finally:
+        total = time.perf_counter() - start
+        request_seconds.observe(endpoint, total)
+        g.stream_done = True
+        current_app.logger.debug("Streamed %s: %s", endpoint, server_timing(request_spans(), total))
+
+def page_response(template, load, sections, **context):
+    """A results page: ``load`` is ``(year, gp, session, *views)`` for load_page,
+    ``sections`` the ``{name: (fn, *args)}`` filling the template's blocks"""
+    if not current_app.config["STREAM_RESULTS"]:
+        load_page(*load)
+        return render_page(template, **context, **run_sections(sections))
+
+    g.streamed_page = True
+    chunks = timed_stream(stream_page(template, load, sections, context),
+                          request.endpoint or "unknown", g.request_start, request_collector())
+    response = current_app.response_class(stream_with_context(chunks), mimetype="text/html")
+    # Proxies mustn't hold the chunks back
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+def table_html(view, *args):
+    # Results tables as the pages show them
+    return view(*args).to_html(classes="table table-striped table-hover text-center", index=False, border=0)
+
+def profiled(view):
+    # Profile the request when profiling is on and the request asks for it;
+    # the artifacts' URLs come back in X-Profile-* headers
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        enabled = current_app.config["PROFILING"]
+        mode = PROFILE_MODES.get(request.values.get("profile", "")) if enabled else None
+        if mode is None:
+            return view(*args, **kwargs)
+
+        cpu, memory = mode
+        def call():
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.is_streamed:
+                # Profile the whole page, not just its first chunk
+                response.make_sequence()
+            return response
+
+        response, profile_id = profile_call(request.endpoint, call, cpu=cpu, memory=memory)
+        if profile_id is None:
+            response.headers["X-Profile"] = "busy"
+            return response
+
+        response.headers["X-Profile"] = profile_id
+        if cpu:
+            response.headers["X-Profile-CPU"] = url_for(".profile_artifact", profile_id=profile_id, artifact="speedscope.json")
+        if memory:
+            response.headers["X-Profile-Memory"] = url_for(".profile_artifact", profile_id=profile_id, artifact="alloc.json")
+        return response
+    return wrapper
+
+@bp.route('/', methods=['GET'])
 def home():
-    drivers_table = drivers_championship_table()
-    constructors_table = constructors_championship_table()
+    info = lazy("visualizations.info")
+    drivers_table = info.drivers_championship_table()
+    constructors_table = info.constructors_championship_table()
 
-    iso, gp_name, description, image_name = find_next_race_info()
+    iso, gp_name, description, image_name = info.find_next_race_info()
 
-    return render_template("home.html",
+    return render_page("home.html",
                            drivers_table=drivers_table,
                            constructors_table=constructors_table,
                            next_race_iso=iso,
@@ -28,84 +224,110 @@ def home():
                            next_race_description=description,
                            next_race_image=image_name)
 
-@app.route('/results', methods=['POST'])
+@bp.route('/results', methods=['POST'])
+@profiled
 def results():
     year = int(request.form['year'])
     gp = request.form['gp']
     gp_name = gp
     session = request.form['session']
+    info = lazy("visualizations.info")
 
     if session in ["FP1", "FP2", "FP3"]:
-        df = DriverTimingsFP(year, gp, session)
-        table_html = df.to_html(classes="table table-striped table-hover text-center", index=False, border=0)
-        track_img = find_track_image(year, gp)
-        return render_template("index_fp.html",year=year, gp_name=gp_name , session=session , table=table_html, track_img=track_img)
+        template = "index_fp.html"
+        # Load only the data this page uses, once
+        load = (year, gp, session, info.DriverTimingsFP)
+        sections = {"table": (table_html, info.DriverTimingsFP, year, gp, session)}
+        context = dict(year=year, gp_name=gp_name, session=session)
 
     elif session == "R":
-        # Table of results
-        df = RaceResults(year, gp)
-        table_html = df.to_html(classes="table table-striped table-hover text-center", index=False, border=0)
-        track_img = find_track_image(year, gp)
-        # Generate combined Plotly dashboard (interactive)
-        plots_html = combined_plotly_race_dashboard(year, gp)
-        # Generate trye strategy plot
-        tyre_strat = TyreStrategies(year, gp) 
-        # Load session
-        sess = fastf1.get_session(year, gp, "R")
-        sess.load(telemetry=False, weather=False)
-        # Correcting driver identification
-        drivers = [sess.get_driver(d)["Abbreviation"] for d in sess.drivers]
-
-        return render_template(
-            "index_race.html",
-            year=year,
-            gp=gp_name,
-            gp_name=gp_name,
-            session=session,
-            table=table_html,
-            plots_html=plots_html,
-            tyre_strat=tyre_strat,
-            drivers = drivers,
-            track_img=track_img
-
-        )
+        plots, race = lazy("visualizations.plots"), lazy("visualizations.race")
+        template = "index_race.html"
+        # Load only the data this page uses, once
+        load = (year, gp, "R", info.RaceResults, race.combined_plotly_race_dashboard, plots.TyreStrategies, info.DriverList)
+        # The sections are independent once the session is loaded
+        sections = {
+            # Table of results
+            "table": (table_html, info.RaceResults, year, gp),
+            # Generate trye strategy plot
+            "tyre_strat": (plots.TyreStrategies, year, gp),
+            # Correcting driver identification
+            "drivers": (info.DriverList, year, gp, "R"),
+        }
+        context = dict(year=year, gp=gp_name, gp_name=gp_name, session=session)
+        if current_app.config["RACE_DASHBOARD_INLINE"]:
+            # Generate combined Plotly dashboard (interactive)
+            sections["plots_html"] = (race.combined_plotly_race_dashboard, year, gp)
+        else:
+            # Otherwise the page fetches each figure's JSON itself
+            context["dashboard_urls"] = [url_for(".race_dashboard_figure", name=name, year=year, gp=gp) for name in race.DASHBOARD_FIGURES]
 
     elif session == "Q":
-        print("QUALI BLOCK RUNNING")
-        # Get overall quali times 
-        df = DriverTimingsQuali(year, gp)
-        # Get quali session by session times 
-        qs_df = DriverTimingsQualiSession(year,gp)
-        # Get track image
-        track_img = find_track_image(year, gp)
-
-        # Load session
-        sess = fastf1.get_session(year, gp, "Q")
-        sess.load(telemetry=False)
-
-        drivers = []
-        for d in sess.drivers:
-            print("Driver code:", d)
-            info = sess.get_driver(d)
-            print("Driver info:", info)
-            drivers.append(info["Abbreviation"])
-
-        print("Final drivers list:", drivers)
-
-        table_html = df.to_html(classes="table table-striped table-hover text-center", index=False, border=0)
-        qs_table_html = qs_df.to_html(classes="table table-striped table-hover text-center", index=False, border=0)
-        return render_template("index_quali.html",year=year, gp_name=gp , session=session , table=table_html, qstable = qs_table_html, track_img=track_img,drivers=drivers)
+        template = "index_quali.html"
+        # Load only the data this page uses, once
+        load = (year, gp, "Q", info.DriverTimingsQuali, info.DriverTimingsQualiSession, info.DriverList)
+        sections = {
+            # Get overall quali times
+            "table": (table_html, info.DriverTimingsQuali, year, gp),
+            # Get quali session by session times
+            "qstable": (table_html, info.DriverTimingsQualiSession, year, gp),
+            "drivers": (info.DriverList, year, gp, "Q"),
+        }
+        context = dict(year=year, gp_name=gp, session=session)
     else:
         return "Invalid session", 400
 
-@app.route("/driver_vs_driver_pace_plot", methods=["GET"])
+    # From the schedule index: unknown events fail here, before anything is sent
+    context["track_img"] = info.find_track_image(year, gp)
+    return page_response(template, load, sections, **context)
+
+@bp.route("/race_dashboard/<name>.json")
+def race_dashboard_figure(name):
+    year = int(request.args["year"])
+    gp = request.args["gp"]
+    race = lazy("visualizations.race")
+    if name not in race.DASHBOARD_FIGURES:
+        return "Unknown figure", 404
+
+    variants = race.race_dashboard_json(year, gp, name)
+    etag = content_etag(variants["identity"])
+
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        encoding = pick_encoding(request.accept_encodings, variants)
+        response = current_app.response_class(variants[encoding], mimetype="application/json")
+        if encoding != "identity":
+            response.content_encoding = encoding
+
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    if session_is_historical(year, gp, "R"):
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+@bp.route("/team_speeds")
+def team_speeds():
+    year = int(request.args["year"])
+    gp = request.args["gp"]
+    session = request.args.get("session", "Q")
+
+    table = lazy("analysis.analysis").TeamSpeedTable(year, gp, session)
+    # NaN isn't valid JSON
+    return jsonify(table.astype(object).where(table.notna(), None).to_dict(orient="records"))
+
+@bp.route("/driver_vs_driver_pace_plot", methods=["GET"])
+@profiled
 def driver_vs_driver_pace_plot_route():
     year = int(request.args["year"])
     gp = request.args["gp"]
     driver_a = request.args["a"]
     driver_b = request.args["b"]
 
-    data = dvdp_plot(
+    data = lazy("visualizations.race").driver_vs_driver_pace_plot(
         year=year,
         grand_prix=gp,
         driver_A=driver_a,
@@ -114,29 +336,129 @@ def driver_vs_driver_pace_plot_route():
 
     return jsonify(data)
 
-@app.route("/telemetry")
+def replay_response(payload, final):
+    lap_animation = lazy("visualizations.lap_animation")
+    # Typed binary columns for clients that ask for them, JSON otherwise
+    mime = lap_animation.REPLAY_MIME
+    binary = request.accept_mimetypes.best_match(["application/json", mime]) == mime
+    etag = content_etag(payload) + ("" if binary else "-json")
+
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    elif binary:
+        response = current_app.response_class(payload, mimetype=mime)
+    else:
+        response = jsonify(lap_animation.replay_to_json(lap_animation.decode_replay_binary(payload)))
+
+    response.set_etag(etag)
+    response.vary.add("Accept")
+    if final:
+        # Past sessions never change
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+@bp.route("/telemetry")
+@profiled
 def driver_telemetry_visualised_backend():
     year = int(request.args["year"])
     gp = request.args["gp"]
     driver = request.args["driver"]
 
-    data = DriverTelemetryVisualised(year,gp,driver)
+    try:
+        payload, final = lazy("visualizations.lap_animation").QualiLapReplayPayload(year, gp, driver)
+    except ValueError as e:
+        # Unknown driver, or no timed lap
+        return str(e), 404
+    return replay_response(payload, final)
 
-    return data
+@bp.route("/quali_replay")
+def quali_replay():
+    # Several cars' fastest laps on one timeline: ?drivers=VER,NOR or ?top=10
+    year = int(request.args["year"])
+    gp = request.args["gp"]
+    drivers = [d for d in request.args.get("drivers", "").split(",") if d.strip()]
+    lap_animation = lazy("visualizations.lap_animation")
+    top = request.args.get("top", lap_animation.REPLAY_TOP, type=int)
 
-@app.route("/driver_quali_lap_visualised")
+    try:
+        payload, final = lap_animation.QualiReplayPayload(year, gp, drivers, top)
+    except ValueError as e:
+        return str(e), 404
+    return replay_response(payload, final)
+
+@bp.route("/driver_quali_lap_visualised")
 def driver_quali_lap():
     year = request.args.get("year")
     gp = request.args.get("gp")
     driver = request.args.get("driver")
+    # Optional ghost cars: a comma separated list of drivers, or "top"
+    ghosts = request.args.get("ghosts", "")
 
-    return render_template(
+    return render_page(
         "driver_quali_lap.html",
         year=year,
         gp=gp,
-        driver=driver
+        driver=driver,
+        ghosts=ghosts
     )
 
+@bp.route("/figures/<fid>.png")
+def figure(fid):
+    png = lazy("visualizations.figures").figure_png(fid)
+    if png is None:
+        return "Unknown figure", 404
+
+    # Figure ids are content hashes, the bytes behind one never change
+    response = current_app.response_class(png, mimetype="image/png")
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+@bp.route("/stats/sessions")
+def session_stats():
+    return jsonify(session_load_stats())
+
+@bp.route("/stats/standings")
+def standings_stats():
+    return jsonify(lazy("visualizations.standings").standings_info())
+
+@bp.route("/stats/startup")
+def startup_stats():
+    # How long the app took to build, and what the lazy imports have cost so far
+    return jsonify({
+        "create_app_ms": round(_boot["create_app_seconds"] * 1000, 1),
+        "imports_ms": {module: round(seconds * 1000, 1) for module, seconds in _import_seconds.items()},
+    })
+
+@bp.route("/profiles")
+def profiles():
+    if not current_app.config["PROFILING"]:
+        return "Profiling is disabled", 404
+    return jsonify([
+        {"id": profile_id, **{artifact: url_for(".profile_artifact", profile_id=profile_id, artifact=artifact)
+                              for artifact in artifacts}}
+        for profile_id, artifacts in list_profiles().items()
+    ])
+
+@bp.route("/profiles/<profile_id>/<artifact>")
+def profile_artifact(profile_id, artifact):
+    path = profile_path(profile_id, artifact) if current_app.config["PROFILING"] else None
+    if path is None or not os.path.exists(path):
+        return "Unknown profile", 404
+    return send_file(path, mimetype="application/json", as_attachment=True)
+
+@bp.route("/metrics")
+def metrics():
+    # Span and request histograms, cache hit rates and loads in flight
+    return current_app.response_class(prometheus_text(session_load_stats()), mimetype="text/plain; version=0.0.4")
+
+
+app = create_app()
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
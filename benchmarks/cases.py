@@ -0,0 +1,213 @@
+"""What the benchmark suite times.
+
+One case per public view of info.py, plots.py, race.py, lap_animation.py,
+track_maps.py and analysis/analysis.py, plus the Flask routes through the
+test client. A case is called with a ``BenchContext`` that names the event
+and the drivers to use, and may have an untimed ``setup`` whose return
+values are passed on.
+
+Left out, because they only work against live services: the championship
+tables and the home page (Ergast and formula1.com), and TrackDisplay (a batch
+job writing into static/).
+"""
+import matplotlib.pyplot as plt
+
+import analysis.analysis as analysis
+import visualizations.info as info
+import visualizations.lap_animation as lap_animation
+import visualizations.plots as plots
+import visualizations.race as race
+import visualizations.track_maps as track_maps
+from visualizations.sessions import clear_session_cache, load_session
+
+# Sessions the cases read, loaded in full before anything is timed
+BENCH_SESSIONS = ["R", "Q", "FP1", "FP2", "FP3"]
+
+
+# -------------------- Registry --------------------
+
+class Case:
+
+    def __init__(self, group: str, name: str, fn, setup=None):
+        self.group = group
+        self.name = name
+        self.fn = fn
+        self.setup = setup
+
+    @property
+    def key(self) -> str:
+        return f"{self.group}.{self.name}"
+
+    def run(self, ctx, args=()):
+        return self.fn(ctx, *args)
+
+
+class BenchContext:
+    """The session every case reads, and things derived from it once"""
+
+    def __init__(self, year: int, gp: str):
+        self.year = year
+        self.gp = gp
+        self._client = None
+
+        self.warm()
+        # The two front runners, who are sure to have laps
+        self.drivers = list(load_session(year, gp, "R").results["Abbreviation"][:2])
+        self.quali_drivers = list(load_session(year, gp, "Q").results["Abbreviation"][:2])
+
+    def warm(self):
+        """Make sure every session is in memory, so cases time the views only"""
+        for session_type in BENCH_SESSIONS:
+            load_session(self.year, self.gp, session_type)
+
+    @property
+    def client(self):
+        if self._client is None:
+            from app import app
+            self._client = app.test_client()
+        return self._client
+
+    def get(self, url, **kwargs):
+        return _ok(self.client.get(url, **kwargs))
+
+    def post(self, url, **kwargs):
+        return _ok(self.client.post(url, **kwargs))
+
+
+def _ok(response):
+    from app import SECTION_ERROR_HTML
+
+    if response.status_code not in (200, 304):
+        raise AssertionError(f"{response.request.path} returned {response.status_code}")
+    # Results pages stream their sections: reading the whole body is what
+    # runs them, otherwise only the page shell would be timed
+    body = response.get_data()
+    if response.mimetype == "text/html" and SECTION_ERROR_HTML.encode("utf-8") in body:
+        raise AssertionError(f"{response.request.path} rendered a section's error fallback")
+    return response
+
+
+CASES = []
+
+
+def add(group, name, fn, setup=None):
+    CASES.append(Case(group, name, fn, setup))
+
+
+def teardown():
+    # Views that draw with pyplot leave their figures open
+    plt.close("all")
+
+
+# -------------------- Sessions --------------------
+
+# Cold load of a whole race weekend session from the provider
+add("sessions", "load_race", lambda c: load_session(c.year, c.gp, "R"), setup=lambda c: clear_session_cache())
+add("sessions", "load_quali", lambda c: load_session(c.year, c.gp, "Q"), setup=lambda c: clear_session_cache())
+
+
+# -------------------- info.py --------------------
+
+add("info", "RaceResults", lambda c: info.RaceResults(c.year, c.gp))
+add("info", "DriverTimingsFP", lambda c: info.DriverTimingsFP(c.year, c.gp, "FP1"))
+add("info", "DriverTimingsQuali", lambda c: info.DriverTimingsQuali(c.year, c.gp))
+add("info", "DriverTimingsCombined", lambda c: info.DriverTimingsCombined(c.year, c.gp))
+add("info", "DriverTimingsQualiSession", lambda c: info.DriverTimingsQualiSession(c.year, c.gp))
+add("info", "DriverList", lambda c: info.DriverList(c.year, c.gp, "R"))
+add("info", "find_track_image", lambda c: info.find_track_image(c.year, c.gp))
+add("info", "find_next_race_info", lambda c: info.find_next_race_info())
+
+
+# -------------------- plots.py --------------------
+
+add("plots", "SpeedAcrossQualiLap", lambda c: plots.SpeedAcrossQualiLap(c.year, c.gp, c.quali_drivers[0]))
+add("plots", "RacePOSChange", lambda c: plots.RacePOSChange(c.year, c.gp))
+add("plots", "RaceLapTimePlot", lambda c: plots.RaceLapTimePlot(c.year, c.gp))
+add("plots", "TeamPaceComp", lambda c: plots.TeamPaceComp(c.year, c.gp))
+add("plots", "BrakePressure", lambda c: plots.BrakePressure(c.year, c.gp, "Q", c.quali_drivers[0]))
+add("plots", "ThrottleVSBrakePressure", lambda c: plots.ThrottleVSBrakePressure(c.year, c.gp, "Q", c.quali_drivers[0]))
+add("plots", "DriverVSDriverStats", lambda c: plots.DriverVSDriverStats(c.year, c.gp, "Q", *c.quali_drivers))
+add("plots", "TyreStrategies", lambda c: plots.TyreStrategies(c.year, c.gp))
+add("plots", "DriverLapTimes", lambda c: plots.DriverLapTimes(c.year, c.gp, "R", *c.drivers))
+add("plots", "DriverReactionTimes", lambda c: plots.DriverReactionTimes(c.year, c.gp, c.drivers[0]))
+
+
+# -------------------- track_maps.py --------------------
+
+add("track_maps", "track_map", lambda c: track_maps.track_map(c.year, c.gp))
+add("track_maps", "draw_map", lambda c, tmap: track_maps.draw_map(tmap),
+    setup=lambda c: (track_maps.track_map(c.year, c.gp),))
+
+
+# -------------------- race.py --------------------
+
+add("race", "race_dashboard_figures", lambda c: race.race_dashboard_figures(c.year, c.gp))
+add("race", "combined_plotly_race_dashboard", lambda c: race.combined_plotly_race_dashboard(c.year, c.gp))
+add("race", "race_dashboard_json", lambda c: race.race_dashboard_json(c.year, c.gp, "positions"))
+add("race", "driver_vs_driver_pace_plot", lambda c: race.driver_vs_driver_pace_plot(c.year, c.gp, *c.drivers))
+
+
+# -------------------- lap_animation.py --------------------
+
+def _replay(c):
+    return (lap_animation.QualiReplay(c.year, c.gp),)
+
+
+def _payload(c):
+    return (lap_animation.encode_replay_binary(lap_animation.QualiReplay(c.year, c.gp)),)
+
+
+def _in_app(view):
+    # These views return flask responses, which need an application context
+    def run(c):
+        with c.client.application.app_context():
+            return view(c)
+    return run
+
+
+add("lap_animation", "QualiReplay", lambda c: lap_animation.QualiReplay(c.year, c.gp))
+add("lap_animation", "QualiLapReplay", lambda c: lap_animation.QualiLapReplay(c.year, c.gp, c.quali_drivers[0]))
+add("lap_animation", "DriverVSDriverQuali", _in_app(lambda c: lap_animation.DriverVSDriverQuali(c.year, c.gp, *c.quali_drivers)))
+add("lap_animation", "DriverTelemetryVisualised", _in_app(
+    lambda c: lap_animation.DriverTelemetryVisualised(c.year, c.gp, c.quali_drivers[0])))
+add("lap_animation", "replay_to_json", lambda c, replay: lap_animation.replay_to_json(replay), setup=_replay)
+add("lap_animation", "encode_replay_binary", lambda c, replay: lap_animation.encode_replay_binary(replay), setup=_replay)
+add("lap_animation", "decode_replay_binary", lambda c, payload: lap_animation.decode_replay_binary(payload), setup=_payload)
+add("lap_animation", "QualiReplayPayload", lambda c: lap_animation.QualiReplayPayload(c.year, c.gp))
+add("lap_animation", "QualiLapReplayPayload", lambda c: lap_animation.QualiLapReplayPayload(c.year, c.gp, c.quali_drivers[0]))
+
+
+# -------------------- analysis.py --------------------
+
+add("analysis", "TeamSpeedTable", lambda c: analysis.TeamSpeedTable(c.year, c.gp, "Q"))
+add("analysis", "TopSpeedVSAvgSpeed", lambda c: analysis.TopSpeedVSAvgSpeed(c.year, c.gp, "Q"))
+add("analysis", "FullRacePaceAnalysis", lambda c: analysis.FullRacePaceAnalysis(c.year, c.gp, *c.drivers))
+
+
+# -------------------- Routes --------------------
+
+def _figure_url(c):
+    return (plots.TyreStrategies(c.year, c.gp),)
+
+
+def _query(c, **extra):
+    return {"year": c.year, "gp": c.gp, **extra}
+
+
+add("routes", "results_race", lambda c: c.post("/results", data={"year": c.year, "gp": c.gp, "session": "R"}))
+add("routes", "results_quali", lambda c: c.post("/results", data={"year": c.year, "gp": c.gp, "session": "Q"}))
+add("routes", "results_fp", lambda c: c.post("/results", data={"year": c.year, "gp": c.gp, "session": "FP1"}))
+add("routes", "race_dashboard_json", lambda c: c.get(
+    "/race_dashboard/positions.json", query_string=_query(c), headers={"Accept-Encoding": "gzip"}))
+add("routes", "team_speeds", lambda c: c.get("/team_speeds", query_string=_query(c)))
+add("routes", "driver_vs_driver_pace_plot", lambda c: c.get(
+    "/driver_vs_driver_pace_plot", query_string=_query(c, a=c.drivers[0], b=c.drivers[1])))
+add("routes", "telemetry_json", lambda c: c.get("/telemetry", query_string=_query(c, driver=c.quali_drivers[0])))
+add("routes", "telemetry_binary", lambda c: c.get(
+    "/telemetry", query_string=_query(c, driver=c.quali_drivers[0]), headers={"Accept": lap_animation.REPLAY_MIME}))
+add("routes", "quali_replay", lambda c: c.get(
+    "/quali_replay", query_string=_query(c), headers={"Accept": lap_animation.REPLAY_MIME}))
+add("routes", "driver_quali_lap_page", lambda c: c.get(
+    "/driver_quali_lap_visualised", query_string=_query(c, driver=c.quali_drivers[0])))
+add("routes", "figure_png", lambda c, url: c.get(url), setup=_figure_url)
+add("routes", "session_stats", lambda c: c.get("/stats/sessions"))
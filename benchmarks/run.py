@@ -0,0 +1,273 @@
+"""Benchmark runner.
+
+Times every case in cases.py against a matrix of session sizes and reports
+wall time and peak memory, optionally comparing against a stored baseline:
+
+    python -m benchmarks.run                          # whole matrix
+    python -m benchmarks.run --sizes 20x50 --filter plots.
+    python -m benchmarks.run --save-baseline          # refresh baseline.json
+    python -m benchmarks.run --fixtures path/to/dir --year 2024 --gp Monza
+
+Sessions come from the synthetic provider, or from recorded fixtures with
+--fixtures, never from the network. Every case is measured three ways:
+
+- ``cold_ms``: median over --repeat runs, each after every derived cache
+  (rendered figures, replays, per session tables) has been emptied, i.e.
+  the cost of the first request for a page.
+- ``warm_ms``: median over --repeat runs with those caches left in place.
+- ``peak_kib``: peak traced allocation of one extra cold run.
+
+Sessions are loaded before a case is timed, so only the sessions.* cases
+include load time. Everything runs serially in this process, so rendering
+done by the process pool is timed (and traced) too.
+
+A case regresses when a metric exceeds its baseline by more than
+--tolerance and by more than an absolute floor, which keeps sub-millisecond
+noise out of the report. The exit status is 1 if anything regressed.
+"""
+import argparse
+import contextlib
+import datetime
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+# Session sizes: drivers, race laps and car/position data rate (Hz)
+SIZES = {
+    "20x50": {"n_drivers": 20, "n_laps": 50, "hz": 4.0},
+    "24x78": {"n_drivers": 24, "n_laps": 78, "hz": 4.0},
+    "20x57-10hz": {"n_drivers": 20, "n_laps": 57, "hz": 10.0},
+}
+
+# Event the synthetic sessions are generated for
+DEFAULT_YEAR = 2024
+DEFAULT_GP = "Monza"
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Allowed slowdown before a case counts as a regression
+DEFAULT_TOLERANCE = 0.25
+# Differences below these never count
+MIN_REGRESSION = {"cold_ms": 5.0, "warm_ms": 2.0, "peak_kib": 512.0}
+
+METRICS = ["cold_ms", "warm_ms", "peak_kib"]
+
+# Temporary directory holding this run's derived caches
+_scratch = None
+
+
+# -------------------- Caches --------------------
+
+def reset_derived_caches():
+    """Forget everything computed from the loaded sessions, keeping the sessions"""
+    from visualizations import disk_cache, fuel, lap_animation, race, telemetry
+    from visualizations.schedule import clear_schedule_index
+
+    # A fresh, empty root for the figure and replay disk caches
+    disk_cache.CACHE_ROOT = tempfile.mkdtemp(prefix="f1-bench-", dir=_scratch)
+    for cache in (race._dashboard_json, telemetry._comparisons, fuel._models, lap_animation._replay_laps):
+        cache.clear()
+    clear_schedule_index()
+
+
+# -------------------- Measuring --------------------
+
+def _call(case, ctx, cold: bool):
+    """Run a case once and return its wall time in ms"""
+    if cold:
+        reset_derived_caches()
+    args = case.setup(ctx) if case.setup else ()
+    gc.collect()
+
+    # Views print progress, which isn't what is being timed
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        case.run(ctx, args or ())
+        elapsed = time.perf_counter() - start
+    return elapsed * 1000
+
+
+def _peak(case, ctx) -> float:
+    """Peak memory (KiB) allocated by one cold run"""
+    reset_derived_caches()
+    args = case.setup(ctx) if case.setup else ()
+    gc.collect()
+
+    tracemalloc.start()
+    try:
+        base, _ = tracemalloc.get_traced_memory()
+        with contextlib.redirect_stdout(io.StringIO()):
+            case.run(ctx, args or ())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (peak - base) / 1024
+
+
+def measure(case, ctx, repeat: int) -> dict:
+    from benchmarks.cases import teardown
+
+    ctx.warm()
+    try:
+        cold = [_call(case, ctx, cold=True) for _ in range(repeat)]
+        warm = [_call(case, ctx, cold=False) for _ in range(repeat)]
+        peak = _peak(case, ctx)
+    finally:
+        teardown()
+    return {
+        "cold_ms": round(statistics.median(cold), 3),
+        "warm_ms": round(statistics.median(warm), 3),
+        "peak_kib": round(peak, 1),
+    }
+
+
+def run_size(label, provider, year, gp, cases, repeat) -> dict:
+    from benchmarks.cases import BenchContext
+    from visualizations.sessions import set_session_provider
+
+    set_session_provider(provider)
+    reset_derived_caches()
+    ctx = BenchContext(year, gp)
+
+    results = {}
+    for case in cases:
+        try:
+            results[case.key] = measure(case, ctx, repeat)
+        except Exception as e:
+            results[case.key] = {"error": f"{type(e).__name__}: {e}"}
+        _print_row(label, case.key, results[case.key])
+    return results
+
+
+# -------------------- Baseline --------------------
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """(size, case, metric, baseline, now) for every regression"""
+    regressions = []
+    for size, cases in results.items():
+        for key, now in cases.items():
+            before = baseline.get(size, {}).get(key)
+            if before is None or "error" in before or "error" in now:
+                continue
+            for metric in METRICS:
+                old, new = before[metric], now[metric]
+                if new > old * (1 + tolerance) and new - old > MIN_REGRESSION[metric]:
+                    regressions.append((size, key, metric, old, new))
+    return regressions
+
+
+def load_baseline(path) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)["results"]
+    except FileNotFoundError:
+        return {}
+
+
+def save_results(path, results, args):
+    report = {
+        "meta": {
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "repeat": args.repeat,
+            "sizes": {size: SIZES.get(size, "fixtures") for size in results},
+        },
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+        f.write("\n")
+
+
+# -------------------- Report --------------------
+
+def _print_row(size, key, result):
+    if "error" in result:
+        print(f"{size:<12} {key:<44} ERROR {result['error']}", flush=True)
+    else:
+        print(f"{size:<12} {key:<44} {result['cold_ms']:>10.1f} {result['warm_ms']:>10.1f} "
+              f"{result['peak_kib']:>11.0f}", flush=True)
+
+
+def _print_regressions(regressions, tolerance):
+    if not regressions:
+        print(f"\nNo regressions (tolerance {tolerance:.0%})")
+        return
+    print(f"\n{len(regressions)} regression(s) (tolerance {tolerance:.0%}):")
+    for size, key, metric, old, new in regressions:
+        print(f"  {size:<12} {key:<44} {metric:<9} {old:>10.1f} -> {new:>10.1f} ({new / old - 1:+.0%})")
+
+
+# -------------------- Main --------------------
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", nargs="+", choices=sorted(SIZES), default=list(SIZES),
+                        help="session sizes to run (default: all)")
+    parser.add_argument("--fixtures", help="run against recorded fixtures in this directory instead")
+    parser.add_argument("--year", type=int, default=DEFAULT_YEAR)
+    parser.add_argument("--gp", default=DEFAULT_GP)
+    parser.add_argument("--filter", default="", help="only cases whose group.name contains this")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case and mode")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    global _scratch
+    args = parse_args(argv)
+
+    import fastf1
+    fastf1.set_log_level("WARNING")
+    # Deprecation notices from the views would drown the report
+    warnings.simplefilter("ignore", FutureWarning)
+
+    from benchmarks.cases import CASES
+    from visualizations.executor import SerialExecutor, set_section_executor
+    from visualizations.providers import FixtureProvider, SyntheticProvider
+
+    set_section_executor(SerialExecutor())
+    cases = [case for case in CASES if args.filter in case.key]
+
+    if args.fixtures:
+        matrix = {"fixtures": FixtureProvider(args.fixtures)}
+    else:
+        matrix = {
+            size: SyntheticProvider(SIZES[size]["n_drivers"], {"Race": SIZES[size]["n_laps"]}, SIZES[size]["hz"])
+            for size in args.sizes
+        }
+
+    print(f"{'size':<12} {'case':<44} {'cold ms':>10} {'warm ms':>10} {'peak KiB':>11}")
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="f1-bench-") as scratch:
+        _scratch = scratch
+        for label, provider in matrix.items():
+            results[label] = run_size(label, provider, args.year, args.gp, cases, args.repeat)
+
+    if args.output:
+        save_results(args.output, results, args)
+    if args.save_baseline:
+        save_results(args.baseline, results, args)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, load_baseline(args.baseline), args.tolerance)
+    _print_regressions(regressions, args.tolerance)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+"""Pre-compressed response bodies.
+
+Payloads that are served many times (figure JSON, ...) are compressed once
+when they are cached, and each request just picks the variant its
+Accept-Encoding allows. Brotli is used when the ``brotli`` package is
+installed, gzip always.
+"""
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred first
+ENCODINGS = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+# Bodies smaller than this aren't worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+
+def compress_variants(data: bytes) -> dict:
+    """``{content-encoding: body}``, always including "identity" """
+    variants = {"identity": data}
+    if len(data) < MIN_COMPRESS_BYTES:
+        return variants
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=5)
+    variants["gzip"] = gzip.compress(data, compresslevel=6, mtime=0)
+    return variants
+
+
+def pick_encoding(accept_encodings, variants: dict) -> str:
+    """Best encoding in ``variants`` the client accepts (werkzeug Accept object)"""
+    for encoding in ENCODINGS:
+        if encoding in variants and accept_encodings[encoding]:
+            return encoding
+    return "identity"
@@ -0,0 +1,86 @@
+"""Registry of the session data each view actually uses.
+
+Views declare their needs with ``@uses(...)`` instead of calling a bare
+``session.load()``, which pulls in full telemetry and weather even for views
+that only read lap times. ``plan_load`` merges the needs of every view on a
+page into one minimal set of ``Session.load()`` flags, and ``load_page`` loads
+the shared session once with that plan before the views run.
+
+Registered views are also timed: each call is a metrics span named after
+the view.
+"""
+from visualizations.metrics import timed
+from visualizations.sessions import load_session
+
+# Data a view can ask for
+DATA_PARTS = ("laps", "results", "car_data", "pos_data", "weather", "messages")
+
+# Which Session.load() flag brings each part into memory. Car and position
+# data always arrive together with telemetry=True, results with every load.
+_LOAD_FLAG_FOR_PART = {
+    "laps": "laps",
+    "results": None,
+    "car_data": "telemetry",
+    "pos_data": "telemetry",
+    "weather": "weather",
+    "messages": "messages",
+}
+
+# "module.qualname" of a view -> frozenset of data parts. Views in different
+# modules share names (info, race and analysis all have one or two), so the
+# bare function name isn't enough
+VIEW_REQUIREMENTS = {}
+
+
+def view_key(view) -> str:
+    """Registry key of a view function; strings are taken as keys already"""
+    if isinstance(view, str):
+        return view
+    return f"{view.__module__}.{view.__qualname__}"
+
+
+def uses(*parts):
+    """Decorator registering the data parts a view reads from its session"""
+    unknown = set(parts) - set(DATA_PARTS)
+    if unknown:
+        raise ValueError(f"Unknown data parts: {sorted(unknown)}")
+
+    def register(view):
+        VIEW_REQUIREMENTS[view_key(view)] = frozenset(parts)
+        view = timed()(view)
+        view.data_requirements = frozenset(parts)
+        return view
+
+    return register
+
+
+def requirements_of(*views) -> frozenset:
+    """Union of the data parts needed by the given views (functions or keys)"""
+    needed = set()
+    for view in views:
+        name = view_key(view)
+        if name not in VIEW_REQUIREMENTS:
+            raise KeyError(f"View {name} has no registered data requirements")
+        needed |= VIEW_REQUIREMENTS[name]
+    return frozenset(needed)
+
+
+def plan_load(*views) -> dict:
+    """Minimal Session.load() keyword arguments covering every given view"""
+    flags = {_LOAD_FLAG_FOR_PART[part] for part in requirements_of(*views)}
+    return {
+        "laps": "laps" in flags,
+        "telemetry": "telemetry" in flags,
+        "weather": "weather" in flags,
+        "messages": "messages" in flags,
+    }
+
+
+def load_for(view, year: int, gp: str, session_type: str):
+    """Load the shared session with exactly the data one view needs"""
+    return load_session(year, gp, session_type, **plan_load(view))
+
+
+def load_page(year: int, gp: str, session_type: str, *views):
+    """Load the shared session once with the combined needs of a whole page"""
+    return load_session(year, gp, session_type, **plan_load(*views))
@@ -0,0 +1,80 @@
+"""Keyed on-disk cache for derived data (replays, rendered figures, ...).
+
+Values are opaque bytes stored under ``<cache root>/<name>/``, one file per
+key. The key is hashed, so any tuple of plain values works. Writes go to a
+temporary file first and are moved into place, which keeps concurrent
+workers from ever reading half a file.
+"""
+import hashlib
+import os
+import tempfile
+
+# Root of every derived-data cache (override with F1_DATA_CACHE_DIR)
+CACHE_ROOT = os.environ.get(
+    "F1_DATA_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "dashboard"),
+)
+
+
+def key_digest(key) -> str:
+    """Stable hex digest of a key tuple"""
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+
+def content_etag(data: bytes) -> str:
+    """Strong validator for a payload, derived from its bytes"""
+    return hashlib.sha1(data).hexdigest()
+
+
+class DiskCache:
+
+    def __init__(self, name: str, version: str = "1", suffix: str = ".bin"):
+        self.name = name
+        self.version = version
+        self.suffix = suffix
+
+    @property
+    def directory(self) -> str:
+        return os.path.join(CACHE_ROOT, self.name)
+
+    def path(self, key) -> str:
+        return os.path.join(self.directory, key_digest((self.version, key)) + self.suffix)
+
+    def get(self, key):
+        """Cached bytes for ``key``, or None"""
+        try:
+            with open(self.path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, data: bytes) -> str:
+        """Store ``data`` atomically and return its path"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return path
+
+    def delete(self, key):
+        """Forget ``key``, if it is cached"""
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def get_or_compute(self, key, compute, store: bool = True) -> bytes:
+        """Cached bytes, or ``compute()`` stored for next time (if ``store``)"""
+        data = self.get(key)
+        if data is None:
+            data = compute()
+            if store:
+                self.put(key, data)
+        return data
@@ -0,0 +1,280 @@
+"""Matplotlib drawing for the figures in plots.py.
+
+Everything here runs in the render process pool, so each function takes
+plain, picklable data (numbers, lists, arrays, dicts) and never a session,
+and returns the finished PNG as bytes. This module only imports what drawing
+needs, which keeps the render workers quick to start.
+"""
+from io import BytesIO
+
+import fastf1.plotting
+import matplotlib
+matplotlib.use("Agg") # Ensures that no MatPlotLib GUI's are enabled
+import matplotlib.pyplot as plt
+import pandas as pd
+import seaborn as sns
+
+# Bump whenever a drawing changes, so cached PNGs are redrawn
+FIGURE_VERSION = "1"
+
+_styled = False
+
+
+def setup_style():
+    # Dark theme, applied by the first drawing rather than at import
+    global _styled
+    if not _styled:
+        fastf1.plotting.setup_mpl(misc_mpl_mods=False, color_scheme='fastf1')
+        _styled = True
+
+
+def _png(fig, dpi=None) -> bytes:
+    buf = BytesIO()
+    plt.savefig(buf, format='png', bbox_inches='tight', dpi=dpi)
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def draw_speed_across_quali_lap(t, vCar, Driver):
+    setup_style()
+
+    # Plot graph
+    fig, ax = plt.subplots()
+    ax.plot(t, vCar, label='Fast')
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Speed [Km/h]')
+    ax.set_title(f'{Driver} Fastest Lap')
+    ax.legend()
+
+    return _png(fig)
+
+
+def draw_race_pos_change(lines):
+    setup_style()
+    # lines: (abbreviation, lap numbers, positions, style) per driver
+
+    # Create sub plots
+    fig, ax = plt.subplots(figsize=(9.5, 5))
+
+    for abb, lap_numbers, positions, style in lines:
+        ax.plot(lap_numbers, positions, label=abb, **style)
+
+    # Plot graph
+    ax.set_ylim([20.5, 0.5])
+    ax.set_yticks([1, 5, 10, 15, 20])
+    ax.set_xlabel('Lap')
+    ax.set_ylabel('Position')
+
+    ax.legend(bbox_to_anchor=(1.0, 1.02))
+
+    return _png(fig)
+
+
+def draw_race_lap_time_plot(driver_laps, finishing_order, driver_palette, compound_palette, title):
+    setup_style()
+    # driver_laps: {"Driver": [...], "Compound": [...], "LapTime(s)": [...]}
+    driver_laps = pd.DataFrame(driver_laps)
+
+    # Create the figure
+    fig, ax = plt.subplots(figsize=(10, 5))
+
+    sns.violinplot(data=driver_laps,
+                x="Driver",
+                y="LapTime(s)",
+                hue="Driver",
+                inner=None,
+                density_norm="area",
+                order=finishing_order,
+                palette=driver_palette
+                )
+
+    sns.swarmplot(data=driver_laps,
+                x="Driver",
+                y="LapTime(s)",
+                order=finishing_order,
+                hue="Compound",
+                palette=compound_palette,
+                linewidth=0,
+                size=4
+                )
+
+    # Plot graph
+    ax.set_xlabel("Driver")
+    ax.set_ylabel("Lap Time (s)")
+    plt.suptitle(title)
+    sns.despine(left=True, bottom=True)
+
+    return _png(fig)
+
+
+def draw_team_pace_comp(transformed_laps, team_order, team_palette, title):
+    setup_style()
+    # transformed_laps: {"Team": [...], "LapTime (s)": [...]}
+    transformed_laps = pd.DataFrame(transformed_laps)
+
+    # Plot graph
+    fig, ax = plt.subplots(figsize=(10, 5))
+    sns.boxplot(
+        data=transformed_laps,
+        x="Team",
+        y="LapTime (s)",
+        hue="Team",
+        order=team_order,
+        palette=team_palette,
+        whiskerprops=dict(color="white"),
+        boxprops=dict(edgecolor="white"),
+        medianprops=dict(color="grey"),
+        capprops=dict(color="white"),
+    )
+
+    plt.title(title)
+    plt.grid(visible=False)
+
+    # x-label is redundant
+    ax.set(xlabel=None)
+
+    return _png(fig)
+
+
+def draw_brake_pressure(time, brake_press, Driver):
+    setup_style()
+
+    # Plot graph
+    fig, ax = plt.subplots()
+    ax.plot(time, brake_press, label='Brake Pressure')
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Brake Pressure')
+    ax.set_title(f'{Driver} Brake Pressure Across Lap')
+    ax.legend()
+
+    return _png(fig)
+
+
+def draw_throttle_vs_brake_pressure(time, throttle, brake, speed, Driver):
+    setup_style()
+
+    # Create stacked subplots
+    fig, axs = plt.subplots(3, 1, figsize=(12, 8), sharex=True)
+
+    axs[0].plot(time, throttle, color='green')
+    axs[0].set_ylabel("Throttle (%)")
+    axs[0].set_ylim(0, 105)
+    axs[0].set_title(f'{Driver} - Throttle')
+
+    axs[1].plot(time, brake, color='red')
+    axs[1].set_ylabel("Brake (%)")
+    axs[1].set_ylim(0, 105)
+    axs[1].set_title(f'{Driver} - Brake Pressure')
+
+    axs[2].plot(time, speed, color='blue')
+    axs[2].set_ylabel("Speed (km/h)")
+    axs[2].set_title(f'{Driver} - Speed')
+    axs[2].set_xlabel("Time")
+
+    for ax in axs:
+        ax.grid(True)
+
+    return _png(fig)
+
+
+def draw_driver_vs_driver_stats(distance, channels, delta, Driver1, Driver2, colour1, colour2):
+    setup_style()
+    # channels: {"Speed": (driver 1, driver 2), "Throttle": ..., "Brake": ...}
+    speed1, speed2 = channels["Speed"]
+    throttle1, throttle2 = channels["Throttle"]
+    brake1, brake2 = channels["Brake"]
+
+    fig, axs = plt.subplots(4,1,figsize = (12,10),sharex = True)
+
+    # Create stacked subplots, with the telemetry of both drivers on on the same graphs
+    axs[0].plot(distance,speed1,color = colour1)
+    axs[0].plot(distance,speed2,color = colour2)
+    axs[0].set_ylabel("Speed (km/h)")
+    axs[0].set_title(f"{Driver1} vs {Driver2} - Speed")
+
+    axs[1].plot(distance,throttle1,color = colour1)
+    axs[1].plot(distance,throttle2,color = colour2)
+    axs[1].set_ylabel("Throttle (%)")
+    axs[1].set_title(f"{Driver1} vs {Driver2} - Throttle")
+
+    axs[2].plot(distance,brake1,color = colour1)
+    axs[2].plot(distance,brake2,color = colour2)
+    axs[2].set_ylabel("Brake (%)")
+    axs[2].set_title(f"{Driver1} vs {Driver2} - Brake Pressure")
+
+    # Above zero driver 2 is behind
+    axs[3].plot(distance,delta,color = colour2)
+    axs[3].axhline(0,color = colour1,linewidth = 1)
+    axs[3].set_ylabel(f"Gap to {Driver1} (s)")
+    axs[3].set_title(f"{Driver1} vs {Driver2} - Delta Time")
+    axs[3].set_xlabel("Distance (m)")
+
+    for ax in axs:
+        ax.grid(True)
+
+    return _png(fig)
+
+
+def draw_tyre_strategies(bars, title):
+    setup_style()
+    # bars: (driver, stint length, stint start, colour) per stint
+
+    # Plot graph
+    fig, ax = plt.subplots(figsize=(10.8, 10))
+
+    for driver, width, left, colour in bars:
+        plt.barh(
+            y=driver,
+            width=width,
+            left=left,
+            color=colour,
+            edgecolor="black",
+            fill=True
+        )
+
+    plt.title(title)
+    plt.xlabel("Lap Number")
+    plt.grid(False)
+    # Invert the y-axis so drivers that finish higher are closer to the top
+    ax.invert_yaxis()
+
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.spines['left'].set_visible(False)
+
+    return _png(fig)
+
+
+def draw_driver_lap_times(lines):
+    setup_style()
+    # lines: (driver, lap times, style) per driver
+
+    fig, ax = plt.subplots(figsize=(8,5))
+
+    for driver, lap_times, style in lines:
+        ax.plot(lap_times, **style, label = driver)
+
+    # Set labels
+    ax.set_xlabel("Lap Number")
+    ax.set_ylabel("Lap Time")
+
+    return _png(fig)
+
+
+def draw_track_map(track_x, track_y, corners, title):
+    setup_style()
+    # Rotated track outline, and (label, track x, track y, label x, label y) per corner
+    fig = plt.figure(figsize=(6, 6))
+    plt.plot(track_x, track_y)
+
+    for txt, track_cx, track_cy, text_x, text_y in corners:
+        plt.scatter(text_x, text_y, color='grey', s=300)
+        plt.plot([track_cx, text_x], [track_cy, text_y], color='grey')
+        plt.text(text_x, text_y, txt, va='center_baseline', ha='center', size='small', color='white')
+
+    plt.title(title)
+    plt.xticks([])
+    plt.yticks([])
+    plt.axis('equal')
+
+    return _png(fig, dpi=150)
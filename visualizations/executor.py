@@ -0,0 +1,157 @@
+"""Run the independent sections of a page concurrently.
+
+Once a page's session is loaded its tables and plots don't depend on each
+other, so ``run_sections`` submits them all at once and the page costs about
+as much as its slowest section. Sections run on a thread pool (pandas and I/O
+release the GIL often enough), while matplotlib drawing, which is CPU bound
+and not thread safe, goes to a process pool through ``render``.
+
+The executor is pluggable: ``set_section_executor`` swaps in any object with
+``submit(kind, fn, *args, **kwargs)``. ``SerialExecutor`` runs everything in
+the calling thread, which is what F1_SECTION_EXECUTOR=serial selects.
+"""
+import contextvars
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+
+from visualizations.fastf1_cache import fastf1_cache_dir
+from visualizations.metrics import span
+
+# Pool sizes (override with F1_SECTION_THREADS / F1_RENDER_PROCESSES)
+SECTION_THREADS = int(os.environ.get("F1_SECTION_THREADS", "8"))
+RENDER_PROCESSES = int(os.environ.get("F1_RENDER_PROCESSES", str(min(4, os.cpu_count() or 1))))
+
+# Session cache budget of each render process (override with
+# F1_WORKER_SESSION_CACHE_MB). Workers load sessions too (season rounds,
+# track maps) and would otherwise each get the web process's full budget
+WORKER_SESSION_CACHE_BYTES = int(os.environ.get("F1_WORKER_SESSION_CACHE_MB", "256")) * 1024 * 1024
+
+# Kinds of work a section executor accepts
+THREAD = "thread"
+PROCESS = "process"
+
+
+class SerialExecutor:
+    """Runs every submission inline, in the calling thread"""
+
+    def submit(self, kind, fn, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self):
+        pass
+
+
+def _init_worker(session_cache_bytes: int, fastf1_cache_dir: str):
+    """Runs once in every render process, before its first task"""
+    from visualizations.fastf1_cache import configure_fastf1_cache
+    from visualizations.sessions import configure_session_cache
+
+    configure_session_cache(session_cache_bytes)
+    configure_fastf1_cache(fastf1_cache_dir)
+
+
+class PoolExecutor:
+    """Thread pool for sections, process pool for rendering; both created lazily"""
+
+    def __init__(self, threads: int = SECTION_THREADS, processes: int = RENDER_PROCESSES):
+        self.threads = threads
+        self.processes = processes
+        self._threads = None
+        self._processes = None
+        self._lock = threading.Lock()
+
+    def _pool(self, kind):
+        with self._lock:
+            if kind == PROCESS:
+                if self._processes is None:
+                    # spawn, not fork: the web process has threads running
+                    self._processes = ProcessPoolExecutor(
+                        max_workers=self.processes,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                        initargs=(WORKER_SESSION_CACHE_BYTES, fastf1_cache_dir()),
+                    )
+                return self._processes
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="section")
+            return self._threads
+
+    def submit(self, kind, fn, *args, **kwargs) -> Future:
+        if kind not in (THREAD, PROCESS):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        return self._pool(kind).submit(fn, *args, **kwargs)
+
+    def shutdown(self):
+        with self._lock:
+            for pool in (self._threads, self._processes):
+                if pool is not None:
+                    pool.shutdown(wait=False, cancel_futures=True)
+            self._threads = None
+            self._processes = None
+
+
+def _default_executor():
+    if os.environ.get("F1_SECTION_EXECUTOR", "pool") == "serial":
+        return SerialExecutor()
+    return PoolExecutor()
+
+
+_executor = _default_executor()
+
+
+# -------------------- Public API --------------------
+
+def set_section_executor(executor):
+    """Swap the executor used by run_sections and render, returning the old one"""
+    global _executor
+    previous, _executor = _executor, executor
+    return previous
+
+
+def get_section_executor():
+    return _executor
+
+
+def render(fn, *args, **kwargs):
+    """Run a CPU-bound drawing function in the render process pool and wait for it.
+
+    ``fn`` must be a module-level function taking plain, picklable data.
+    """
+    with span("render"):
+        return _executor.submit(PROCESS, fn, *args, **kwargs).result()
+
+
+def submit_sections(sections: dict) -> dict:
+    """Start ``{name: (fn, *args)}`` concurrently and return ``{name: future}``"""
+    # Each section runs in a copy of the caller's context, so its spans are
+    # counted towards the request that started it
+    return {
+        name: _executor.submit(THREAD, contextvars.copy_context().run, fn, *args)
+        for name, (fn, *args) in sections.items()
+    }
+
+
+def run_sections(sections: dict) -> dict:
+    """Run ``{name: (fn, *args)}`` concurrently and return ``{name: result}``.
+
+    The first exception raised by a section is re-raised once every section
+    has finished.
+    """
+    futures = submit_sections(sections)
+    results = {}
+    error = None
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        raise error
+    return results
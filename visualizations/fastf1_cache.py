@@ -0,0 +1,45 @@
+"""Where FastF1 keeps its HTTP cache.
+
+The app factory sets the directory with ``configure_fastf1_cache``, which
+doesn't import fastf1. Code that is about to reach the FastF1 API calls
+``enable_fastf1_cache`` first, which imports fastf1 and enables the cache
+the first time only, so starting a worker costs nothing here.
+"""
+import os
+import threading
+
+# Used when the app doesn't configure one (override with F1_CACHE_DIR)
+DEFAULT_CACHE_DIR = os.environ.get(
+    "F1_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "fastf1"),
+)
+
+_lock = threading.Lock()
+_cache_dir = DEFAULT_CACHE_DIR
+_enabled = False
+
+
+def configure_fastf1_cache(path: str):
+    """Use ``path`` for FastF1's cache from the next API call on"""
+    global _cache_dir, _enabled
+    with _lock:
+        _cache_dir = path
+        _enabled = False
+
+
+def enable_fastf1_cache():
+    """Point FastF1 at the configured cache directory, once"""
+    global _enabled
+    if _enabled:
+        return
+    with _lock:
+        if _enabled:
+            return
+        import fastf1
+        os.makedirs(_cache_dir, exist_ok=True)
+        fastf1.Cache.enable_cache(_cache_dir)
+        _enabled = True
+
+
+def fastf1_cache_dir() -> str:
+    return _cache_dir
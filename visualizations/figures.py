@@ -0,0 +1,55 @@
+"""Rendered figure cache.
+
+``figure_url(draw, *args)`` names a figure by a hash of the drawing function,
+its arguments and FIGURE_VERSION. The PNG is drawn in the render process pool
+the first time that name is asked for, stored on disk, and served from
+``/figures/<id>.png`` afterwards. The same data always gives the same URL, so
+repeat renders cost a hash and a file check, and browsers can cache the
+image forever.
+"""
+import hashlib
+import os
+import pickle
+import re
+
+from visualizations.disk_cache import DiskCache
+from visualizations.drawing import FIGURE_VERSION
+from visualizations.executor import render
+from visualizations.metrics import count_cache
+from visualizations.singleflight import SingleFlight
+
+# Where rendered figures are served from
+FIGURE_URL = "/figures/{}.png"
+
+# Finished PNGs, keyed by figure id
+figure_cache = DiskCache("figures", version=FIGURE_VERSION, suffix=".png")
+
+# Figure ids are sha1 hex digests
+_FIGURE_ID = re.compile(r"^[0-9a-f]{40}$")
+
+# Concurrent requests for the same figure draw it once
+_renders = SingleFlight()
+
+
+def figure_id(draw, *args) -> str:
+    """Content address of ``draw(*args)``"""
+    # repr() truncates long arrays, pickle doesn't
+    data = pickle.dumps((draw.__module__, draw.__qualname__, FIGURE_VERSION, args), protocol=4)
+    return hashlib.sha1(data).hexdigest()
+
+
+def figure_url(draw, *args) -> str:
+    """URL of the PNG drawn by ``draw(*args)``, rendering it if it isn't cached"""
+    fid = figure_id(draw, *args)
+    cached = os.path.exists(figure_cache.path(fid))
+    count_cache(figure_cache.name, cached)
+    if not cached:
+        _renders.do(fid, lambda: figure_cache.put(fid, render(draw, *args)))
+    return FIGURE_URL.format(fid)
+
+
+def figure_png(fid: str):
+    """Cached PNG bytes of a figure id, or None"""
+    if not _FIGURE_ID.match(fid):
+        return None
+    return figure_cache.get(fid)
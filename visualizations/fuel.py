@@ -0,0 +1,156 @@
+import weakref
+
+import numpy as np
+import pandas as pd
+
+
+# -------------------- Constants --------------------
+
+# Fuel load at the start of a race (kg), burnt down to zero over the race
+FUEL_START_KG = 105.0
+
+# Lap time cost of one kg of fuel (s/kg), used when a fit isn't possible
+DEFAULT_SEC_PER_KG = 0.035
+
+# Fitted fuel effects outside this range are noise, not physics
+SEC_PER_KG_RANGE = (0.015, 0.06)
+
+# Fewer clean laps than this and the fit falls back to the defaults
+MIN_FIT_LAPS = 40
+
+# Fitted models, dropped together with their session
+_models = weakref.WeakKeyDictionary()
+
+
+# -------------------- Model --------------------
+
+class FuelModel:
+    """Linear fuel and tyre-degradation lap time model for one race"""
+
+    def __init__(
+            self,
+            total_laps: int,
+            sec_per_kg: float = DEFAULT_SEC_PER_KG,
+            start_fuel_kg: float = FUEL_START_KG,
+            fuel_per_lap_kg: float = None,
+            deg_per_lap: dict = None,
+            fitted: bool = False
+    ):
+        self.total_laps = max(int(total_laps), 1)
+        self.sec_per_kg = float(sec_per_kg)
+        self.start_fuel_kg = float(start_fuel_kg)
+        self.fuel_per_lap_kg = (float(fuel_per_lap_kg) if fuel_per_lap_kg is not None
+                                else self.start_fuel_kg / self.total_laps)
+        self.deg_per_lap = dict(deg_per_lap or {})
+        self.fitted = fitted
+
+    def fuel_remaining(self, lap_numbers) -> np.ndarray:
+        """Fuel on board (kg) during each lap"""
+        lap_numbers = np.asarray(lap_numbers, dtype=float)
+        return np.clip(self.start_fuel_kg - lap_numbers * self.fuel_per_lap_kg, 0, None)
+
+    def with_overrides(self, sec_per_kg=None, start_fuel_kg=None, fuel_per_lap_kg=None):
+        """Copy of the model with any given (non-None) constants replaced"""
+        if fuel_per_lap_kg is None and start_fuel_kg is None:
+            fuel_per_lap_kg = self.fuel_per_lap_kg
+        return FuelModel(
+            self.total_laps,
+            sec_per_kg=self.sec_per_kg if sec_per_kg is None else sec_per_kg,
+            start_fuel_kg=self.start_fuel_kg if start_fuel_kg is None else start_fuel_kg,
+            fuel_per_lap_kg=fuel_per_lap_kg,
+            deg_per_lap=self.deg_per_lap,
+            fitted=self.fitted and sec_per_kg is None,
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "total_laps": self.total_laps,
+            "sec_per_kg": self.sec_per_kg,
+            "start_fuel_kg": self.start_fuel_kg,
+            "fuel_per_lap_kg": self.fuel_per_lap_kg,
+            "deg_per_lap": self.deg_per_lap,
+            "fitted": self.fitted,
+        }
+
+
+# -------------------- Utilities --------------------
+
+def _clean_laps(laps: pd.DataFrame) -> pd.DataFrame:
+    """Laps usable for fitting: timed, green flag pace, known tyre"""
+    laps = laps.pick_quicklaps() if hasattr(laps, "pick_quicklaps") else laps
+    cols = ["Driver", "LapNumber", "LapTime", "Compound", "TyreLife"]
+    laps = pd.DataFrame(laps[cols]).dropna()
+    # The standing start lap is never representative
+    return laps[laps["LapNumber"] > 1]
+
+
+def fit_fuel_model(laps: pd.DataFrame, total_laps: int, start_fuel_kg: float = FUEL_START_KG) -> FuelModel:
+    """Fit the fuel effect and per-compound degradation from one race's stints.
+
+    Pooled least squares over every clean lap:
+        LapTime = driver + compound + deg[compound] * TyreLife + sec_per_kg * fuel
+    Within a stint tyre age and fuel burn move together, so the fuel effect
+    is identified by tyre life resetting at pit stops on different laps for
+    different drivers. Implausible fits fall back to the defaults.
+    """
+    model = FuelModel(total_laps, start_fuel_kg=start_fuel_kg)
+    clean = _clean_laps(laps)
+    if len(clean) < MIN_FIT_LAPS:
+        return model
+
+    drivers, driver_names = pd.factorize(clean["Driver"])
+    compounds, compound_names = pd.factorize(clean["Compound"])
+    n, n_drv, n_cmp = len(clean), len(driver_names), len(compound_names)
+    rows = np.arange(n)
+    tyre_life = clean["TyreLife"].to_numpy(dtype=float)
+
+    # Columns: driver intercepts | compound offsets (first compound is the
+    # baseline) | degradation per compound | fuel
+    X = np.zeros((n, n_drv + (n_cmp - 1) + n_cmp + 1))
+    X[rows, drivers] = 1.0
+    offset = compounds > 0
+    X[rows[offset], n_drv + compounds[offset] - 1] = 1.0
+    X[rows, n_drv + n_cmp - 1 + compounds] = tyre_life
+    X[:, -1] = model.fuel_remaining(clean["LapNumber"].to_numpy())
+
+    y = clean["LapTime"].dt.total_seconds().to_numpy()
+
+    try:
+        coef, *_ = np.linalg.lstsq(X, y, rcond=None)
+    except np.linalg.LinAlgError:
+        return model
+
+    sec_per_kg = coef[-1]
+    if not (SEC_PER_KG_RANGE[0] <= sec_per_kg <= SEC_PER_KG_RANGE[1]):
+        return model
+
+    deg = coef[n_drv + n_cmp - 1:n_drv + 2 * n_cmp - 1]
+    model.sec_per_kg = float(sec_per_kg)
+    model.deg_per_lap = {str(c): float(d) for c, d in zip(compound_names, deg)}
+    model.fitted = True
+    return model
+
+
+# -------------------- Public API --------------------
+
+def fuel_model_for(session) -> FuelModel:
+    """The race's fitted fuel model, computed once and kept with the session"""
+    model = _models.get(session)
+    if model is None:
+        total_laps = int(session.laps["LapNumber"].max())
+        model = fit_fuel_model(session.laps, total_laps)
+        _models[session] = model
+    return model
+
+
+def corrected_lap_times(laps: pd.DataFrame, model: FuelModel, tyres: bool = False) -> np.ndarray:
+    """Fuel (and optionally tyre age) corrected lap times in seconds, one array op"""
+    lap_s = pd.to_numeric(laps["LapTime"].dt.total_seconds(), errors="coerce").to_numpy()
+    corrected = lap_s - model.fuel_remaining(laps["LapNumber"].to_numpy()) * model.sec_per_kg
+
+    if tyres and model.deg_per_lap:
+        deg = laps["Compound"].map(model.deg_per_lap).fillna(0.0).to_numpy(dtype=float)
+        tyre_life = laps["TyreLife"].fillna(1.0).to_numpy(dtype=float)
+        corrected = corrected - deg * (tyre_life - 1.0)
+
+    return corrected
@@ -1,21 +1,10 @@
-import fastf1
 import pandas as pd
-import fastf1.plotting
-import matplotlib
-matplotlib.use("Agg") # Prevents external Mat Plot Lib windows from opening
-import matplotlib.pyplot as plt
-from collections import defaultdict
 from fastf1.ergast import Ergast
-import requests
-from bs4 import BeautifulSoup
-import re
 import datetime
-import pytz
-from flask import url_for
-import os
-
-# Enable cache
-fastf1.Cache.enable_cache("C:/Users/vivaa/F1/f1_dashboard/cache")
+from visualizations.data_requirements import uses, load_for
+from visualizations.fastf1_cache import enable_fastf1_cache
+from visualizations.schedule import find_event, next_event
+from visualizations.standings import register_table, standings_html
 
 # Drivers and Tracks list
 drivers_list = ["LEC","HAM","NOR","PIA","VER","TSU","RUS","ANT","ALO","STR",
@@ -42,114 +31,102 @@ def format_timedelta(td):
     except Exception:
         return "N/A"
 
+# Vectorised format_timedelta for a whole column of times
+def format_timedelta_column(values) -> pd.Series:
+    td = pd.to_timedelta(pd.Series(values), errors="coerce")
+
+    # Work in whole milliseconds so rounding never produces "1:60.000"
+    total_ms = (td.dt.total_seconds() * 1000).round()
+    valid = total_ms.notna()
+    ms = total_ms[valid].astype("int64")
+    sign = pd.Series("", index=ms.index).where(ms >= 0, "-")
+    ms = ms.abs()
+
+    text = (sign
+            + (ms // 60000).astype(str) + ":"
+            + (ms % 60000 // 1000).astype(str).str.zfill(2) + "."
+            + (ms % 1000).astype(str).str.zfill(3))
+
+    formatted = pd.Series("N/A", index=td.index, dtype=object)
+    formatted[valid] = text
+    return formatted
+
 def find_track_image(year: int,gp: str):
-    # Get event schedule
-    events = fastf1.get_event_schedule(year)
-    print(year)
-    # Find matching row
-    print(gp)
-    match = events[(events["EventName"] == gp) |
-        (events["Country"] == gp)]
-
-    if not match.empty:
-        name = match.iloc[0]["Location"]
-    else:
+    # Event by name, country or location from the season's schedule index
+    event = find_event(year, gp)
+    if event is None:
         raise ValueError(f"No event found matching {gp}")
 
-    fname = name + ".png"
+    fname = event["location"] + ".png"
     track_img = fname
 
     return track_img
 
 
-def DriverTimingsFP(year: int, gp: str, session_type: str):
-    session = fastf1.get_session(year, gp, session_type)
-    session.load()
-    
-    results = []
-
-    for drv in session.drivers:
-        drv_laps = session.laps.pick_drivers(drv)
-        if drv_laps.empty:
-            continue
-
-        fastest = drv_laps.pick_fastest()
-        if fastest is None or pd.isna(fastest["LapTime"]):
-            continue  # skip drivers with no valid fastest lap
-
-        drv_info = session.get_driver(drv)
-
-        results.append({
-            "Driver": drv_info["Abbreviation"],
-            "Team": drv_info["TeamName"],
-            "LapNumber": fastest["LapNumber"],
-            "LapTime": pd.to_timedelta(fastest["LapTime"]),
-            "Sector1": pd.to_timedelta(fastest["Sector1Time"]),
-            "Sector2": pd.to_timedelta(fastest["Sector2Time"]),
-            "Sector3": pd.to_timedelta(fastest["Sector3Time"]),
-            "Compound": fastest["Compound"],
+# Columns of a best-lap table, in display order
+BEST_LAP_COLUMNS = ["Driver", "Team", "LapNumber", "LapTime", "Sector1", "Sector2", "Sector3", "Compound"]
+
+def best_lap_table(sessions, formatted: bool = True) -> pd.DataFrame:
+    # Fastest lap per driver for one loaded session or a list of them.
+    # With several sessions (e.g. FP1-FP3) each driver's best across all of
+    # them is kept and a Session column says where it was set.
+    multi = isinstance(sessions, (list, tuple))
+    if not multi:
+        sessions = [sessions]
+
+    frames = []
+    for session in sessions:
+        laps = session.laps
+        # Same rule as pick_fastest(): quickest lap among personal bests
+        laps = laps.loc[(laps["IsPersonalBest"] == True) & laps["LapTime"].notna()]
+        frame = pd.DataFrame({
+            "Driver": laps["Driver"],
+            "Team": laps["DriverNumber"].map(session.results["TeamName"]),
+            "LapNumber": laps["LapNumber"],
+            "LapTime": laps["LapTime"],
+            "Sector1": laps["Sector1Time"],
+            "Sector2": laps["Sector2Time"],
+            "Sector3": laps["Sector3Time"],
+            "Compound": laps["Compound"],
+            "Session": session.name,
         })
+        frames.append(frame)
 
-    # Sort safely
-    results = sorted(results, key=lambda x: x["LapTime"])
+    laps = pd.concat(frames, ignore_index=True)
 
-    # Make a pd dataframe
-    df = pd.DataFrame(results)
-    
-    # Normalise time into minutes, seconds and milliseconds 
-    df['LapTime'] = df['LapTime'].apply(format_timedelta)
-    df['Sector1'] = df['Sector1'].apply(format_timedelta)
-    df['Sector2'] = df['Sector2'].apply(format_timedelta)
-    df['Sector3'] = df['Sector3'].apply(format_timedelta)
+    # One pass for every driver: row of each driver's quickest lap
+    fastest = laps.loc[laps.groupby("Driver")["LapTime"].idxmin()]
+    df = fastest.sort_values("LapTime", kind="stable").reset_index(drop=True)
+    df = df[BEST_LAP_COLUMNS + (["Session"] if multi else [])]
 
-    return df
+    if formatted:
+        # Normalise time into minutes, seconds and milliseconds 
+        for col in ("LapTime", "Sector1", "Sector2", "Sector3"):
+            df[col] = format_timedelta_column(df[col])
 
-def DriverTimingsQuali(year: int, gp: str):
-    session = fastf1.get_session(year, gp, "Q")
-    session.load()
-    
-    results = []
-
-    for drv in session.drivers:
-        drv_laps = session.laps.pick_drivers(drv)
-        if drv_laps.empty:
-            continue
-
-        fastest = drv_laps.pick_fastest()
-        if fastest is None or pd.isna(fastest["LapTime"]):
-            continue  # skip drivers with no valid fastest lap
-
-        drv_info = session.get_driver(drv)
-
-        results.append({
-            "Driver": drv_info["Abbreviation"],
-            "Team": drv_info["TeamName"],
-            "LapNumber": fastest["LapNumber"],
-            "LapTime": pd.to_timedelta(fastest["LapTime"]),
-            "Sector1": pd.to_timedelta(fastest["Sector1Time"]),
-            "Sector2": pd.to_timedelta(fastest["Sector2Time"]),
-            "Sector3": pd.to_timedelta(fastest["Sector3Time"]),
-            "Compound": fastest["Compound"],
-        })
+    return df
 
-    # Sort safely
-    results = sorted(results, key=lambda x: x["LapTime"])
+@uses("laps", "results", "messages")
+def DriverTimingsFP(year: int, gp: str, session_type: str):
+    session = load_for(DriverTimingsFP, year, gp, session_type)
+    return best_lap_table(session)
 
-    # Make a pd dataframe
-    df = pd.DataFrame(results)
-    
-    # Normalise time into minutes, seconds and milliseconds 
-    df['LapTime'] = df['LapTime'].apply(format_timedelta)
-    df['Sector1'] = df['Sector1'].apply(format_timedelta)
-    df['Sector2'] = df['Sector2'].apply(format_timedelta)
-    df['Sector3'] = df['Sector3'].apply(format_timedelta)
+@uses("laps", "results", "messages")
+def DriverTimingsQuali(year: int, gp: str):
+    session = load_for(DriverTimingsQuali, year, gp, "Q")
+    return best_lap_table(session)
 
-    return df
+@uses("laps", "results", "messages")
+def DriverTimingsCombined(year: int, gp: str, session_types=("FP1", "FP2", "FP3")):
+    # Best lap of the weekend so far across several sessions
+    sessions = [load_for(DriverTimingsCombined, year, gp, s) for s in session_types]
+    return best_lap_table(sessions)
 
+# Q1/Q2/Q3 are calculated from laps when the timing API has no results
+@uses("laps", "results", "messages")
 def DriverTimingsQualiSession(year: int, grand_prix: str):
     # Load race session
-    session = fastf1.get_session(year, grand_prix, 'Q')
-    session.load()
+    session = load_for(DriverTimingsQualiSession, year, grand_prix, 'Q')
 
     times = []
 
@@ -181,56 +158,54 @@ def DriverTimingsQualiSession(year: int, grand_prix: str):
 
     return qs_df
 
+# Race control messages mark deleted laps, which then aren't personal bests
+@uses("laps", "results", "messages")
 def RaceResults(year: int, gp: str):
     # Load race session
-    session = fastf1.get_session(year, gp, "R")
-    session.load()
-
-    results = []
+    session = load_for(RaceResults, year, gp, "R")
+    return race_results_table(session)
+
+def race_results_table(session):
+    # Columnar results table for a loaded race, usable on many sessions in a batch
+    results = session.results
+    laps = session.laps
+
+    # One pass over the laps for every driver at once
+    by_driver = laps.groupby("Driver")
+    lap_counts = by_driver.size()
+    # Same rule as pick_fastest(): quickest lap among personal bests
+    best_laps = laps.loc[laps["IsPersonalBest"] == True].groupby("Driver")["LapTime"].min()
+    # Last used compound, NaN included, like iloc[-1] per driver
+    last_compound = laps.drop_duplicates("Driver", keep="last").set_index("Driver")["Compound"]
 
     # Classification already sorted by position
-    for _, row in session.results.iterrows():
-        drv = row['Abbreviation']
-        team = row['TeamName']
-        pos = row['Position']
-        interval = row['Time']  # Interval from leader
-        status = row['Status']  # Finished, DNF, DSQ, etc.
-
-        # Get fastest lap + last tyre
-        drv_laps = session.laps.pick_drivers(drv)
-        if len(drv_laps) > 1:
-            best_lap = drv_laps.pick_fastest()
-            if best_lap is None or best_lap.empty:
-                best_lap = None
-            if best_lap is not None and 'LapTime' in best_lap:
-                best_time = best_lap['LapTime']
-            else:
-                best_time = "N/A"
-            finish_tyre = drv_laps.iloc[-1]['Compound']  # last used compound
-        else:
-            best_time = None
-            finish_tyre = None
-
-        results.append({
-            "Pos": pos,
-            "Driver": drv,
-            "Team": team,
-            "BestLap": best_time,
-            "FinishingTyre": finish_tyre,
-            "Interval": interval,
-            "Status": status
-        })
-
-    # Make a pd dataframe
-    race_df = pd.DataFrame(results)
+    drivers = results["Abbreviation"]
+    enough_laps = drivers.map(lap_counts).fillna(0) > 1
+
+    race_df = pd.DataFrame({
+        "Pos": results["Position"],
+        "Driver": drivers,
+        "Team": results["TeamName"],
+        "BestLap": drivers.map(best_laps).where(enough_laps),
+        "FinishingTyre": drivers.map(last_compound).where(enough_laps, None),
+        "Interval": results["Time"],  # Interval from leader
+        "Status": results["Status"],  # Finished, DNF, DSQ, etc.
+    }).reset_index(drop=True)
 
     # Normalise time into minutes, seconds and milliseconds 
-    race_df['BestLap'] = race_df['BestLap'].apply(format_timedelta)
-    race_df['Interval'] = race_df['Interval'].apply(format_timedelta)
+    race_df["BestLap"] = format_timedelta_column(race_df["BestLap"])
+    race_df["Interval"] = format_timedelta_column(race_df["Interval"])
 
     return race_df
 
-def drivers_championship_table():
+@uses("results")
+def DriverList(year: int, gp: str, session_type: str):
+    # Driver abbreviations in classification order
+    session = load_for(DriverList, year, gp, session_type)
+    return [session.get_driver(d)["Abbreviation"] for d in session.drivers]
+
+def driver_standings():
+    enable_fastf1_cache()
     # Call ergast as an internal function rather than public
     ergast = Ergast()
     # Get standings
@@ -247,9 +222,10 @@ def drivers_championship_table():
         'constructorNames': 'Team'
     })
 
-    return df.to_html(classes="championship-table", index=False, border=0)
+    return df
 
-def constructors_championship_table():
+def constructor_standings():
+    enable_fastf1_cache()
     # Call ergast as an internal function rather than public
     ergast = Ergast()
     # Get standings
@@ -264,101 +240,54 @@ def constructors_championship_table():
         'constructorName': 'Constructor'
     })
 
+    return df
+
+def championship_table_html(df):
     return df.to_html(classes="championship-table", index=False, border=0)
 
+# Fetched in the background and kept in memory, see standings.py
+register_table("drivers", driver_standings, championship_table_html)
+register_table("constructors", constructor_standings, championship_table_html)
+
+def drivers_championship_table():
+    return standings_html("drivers")
+
+def constructors_championship_table():
+    return standings_html("constructors")
+
 
 def find_next_race_info(year=None):
     """
     Returns (iso_utc_str, gp_display_name, description, image_name_or_none)
     """
-    now_utc = datetime.datetime.now().replace(tzinfo=datetime.timezone.utc)
     current_year = datetime.datetime.now().year
     years_to_check = [current_year, current_year + 1] if year is None else [year]
 
-    for y in years_to_check:
-        sched = fastf1.get_event_schedule(y)
-        if sched.empty:
-            continue
-
-        # Try to find datetime column
-        date_col = None
-        for c in sched.columns:
-            if any(k in c.lower() for k in ("date", "start")):
-                date_col = c
-                break
-        if date_col is None:
-            for c in sched.columns:
-                if pd.api.types.is_datetime64_any_dtype(sched[c]):
-                    date_col = c
-                    break
-        if date_col is None:
-            continue
-
-        # Normalize to datetime (UTC)
-        try:
-            sched[date_col] = pd.to_datetime(sched[date_col], errors="coerce", utc=True)
-        except Exception:
-            sched[date_col] = pd.to_datetime(sched[date_col], errors="coerce")
-
-        future_rows = sched[sched[date_col] > now_utc]
-        if future_rows.empty:
-            continue
-
-        next_row = future_rows.sort_values(by=date_col).iloc[0]
-
-        # Find GP name (display)
-        gp_name = None
-        for col in ("EventName", "Event", "name", "Event_LongName","Location"):
-            if col in sched.columns and pd.notna(next_row.get(col)):
-                gp_name = next_row.get(col)
-                break
-        if not gp_name:
-            for v in next_row:
-                if isinstance(v, str) and v.strip():
-                    gp_name = v.strip()
-                    break
-        if not gp_name:
-            continue
-
-        # Ensure tz-aware datetime -> iso
-        next_dt = next_row[date_col]
-        if pd.isna(next_dt):
-            continue
-        if getattr(next_dt, "tzinfo", None) is None:
-            next_dt = pytz.UTC.localize(next_dt)
-        iso = next_dt.astimezone(pytz.UTC).isoformat()
-
-        # Get description (case-insensitive)
-        desc = ""
-        for k, v in TRACK_DESCRIPTIONS.items():
-            if k.strip().lower() == str(gp_name).strip().lower():
-                desc = v
-                break
-
-        # Get event schedule
-        events = fastf1.get_event_schedule(y)
-
-        # Find matching row
-        match = events[events["EventName"] == gp_name]
-
-        if not match.empty:
-            name = match.iloc[0]["Location"]
-        else:
-            raise ValueError(f"No event found matching {gp_name}")
-
-        fname = name + ".png"
-        image_name = fname
-
-        return iso, gp_name, desc, image_name
-
-    return "", "", "", None
+    # First race (or test) still to start, bisected from the schedule index
+    upcoming = next_event(years_to_check)
+    if upcoming is None:
+        return "", "", "", None
+    _, event = upcoming
 
-def find_track_stats():
-    remaining_events = fastf1.get_events_remaining()
+    gp_name = event["name"]
+    iso = event["start"].isoformat()
+
+    # Get description (case-insensitive)
+    desc = ""
+    for k, v in TRACK_DESCRIPTIONS.items():
+        if k.strip().lower() == str(gp_name).strip().lower():
+            desc = v
+            break
+
+    image_name = event["location"] + ".png"
 
-    next_race = remaining_events.iloc[0]
+    return iso, gp_name, desc, image_name
 
-    next_race["Ra"]
+def find_track_stats():
+    # Schedule entry of the next event, None once no season has one left
+    current_year = datetime.datetime.now().year
+    upcoming = next_event([current_year, current_year + 1])
+    return upcoming[1] if upcoming is not None else None
 
 TRACK_DESCRIPTIONS = {
     "Australian Grand Prix": "The Australian Grand Prix kicks off the season at Melbourne’s Albert Park, combining parkland road sections with high-speed straights. It’s known for unpredictable weather and tight margins in early-season performance.",
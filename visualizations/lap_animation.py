@@ -1,68 +1,270 @@
-import fastf1
 from flask import jsonify
 import numpy as np
+import struct
+import weakref
+from visualizations.data_requirements import uses, load_for
+from visualizations.disk_cache import DiskCache
+from visualizations.metrics import count_cache
+from visualizations.sessions import session_is_historical
+
+# Replay playback rate
+REPLAY_HZ = 60
+
+# Binary replay format, see encode_replay_binary
+REPLAY_MIME = "application/x-f1-replay"
+REPLAY_MAGIC = b"F1RP"
+REPLAY_VERSION = 2
+
+# Column order and dtype in the binary payload ("f" = float32, "B" = uint8).
+# The timeline is shared by every car, the other columns have a row per car.
+REPLAY_COLUMNS = [("x", "f"), ("y", "f"), ("t", "f"), ("speed", "f"), ("throttle", "f"),
+                  ("brake", "f"), ("gear", "B"), ("rpm", "f"), ("drs", "B")]
+SHARED_COLUMNS = {"t"}
+
+# Smooth channels are interpolated, stepped ones hold their last value
+INTERPOLATED_CHANNELS = ["x", "y", "speed", "throttle", "brake", "rpm"]
+STEPPED_CHANNELS = ["gear", "drs"]
+
+# Cars in the ghost replay when no drivers are given
+REPLAY_TOP = 10
+
+# Finished replay payloads on disk. The version changes whenever the
+# resampling or the format does, which orphans every older entry.
+# REPLAY_SAMPLING is bumped for resampling changes that keep the format.
+REPLAY_SAMPLING = 2
+replay_cache = DiskCache("replays", version=f"v{REPLAY_VERSION}.{REPLAY_SAMPLING}-{REPLAY_HZ}hz-{len(REPLAY_COLUMNS)}cols")
+
+# Resampled laps already computed, per session: driver -> (lap time,
+# {channel: REPLAY_HZ samples from the lap start}), or None without a lap
+_replay_laps = weakref.WeakKeyDictionary()
+
+def _window(data, start: float, end: float, columns):
+    # One stream (car or position data) from the sample before ``start`` to
+    # the one after ``end``: (seconds from ``start``, {column: samples})
+    time_sec = data['SessionTime'].to_numpy().astype('timedelta64[ns]').astype(np.int64) / 1e9
+    lo = max(np.searchsorted(time_sec, start, side='left') - 1, 0)
+    hi = np.searchsorted(time_sec, end, side='right') + 1
+    return time_sec[lo:hi] - start, {column: data[column].to_numpy(dtype=float)[lo:hi] for column in columns}
+
+def _lap_samples(session, lap):
+    # One lap as (seconds from lap start, {channel: samples}), sliced straight
+    # out of the session's car and position data by the lap's start and end
+    # times. lap.get_telemetry() did the same merge through pandas at about
+    # 0.4 s a car. The two streams are merged on the union of their sample
+    # times, each channel interpolated (or stepped) from its own stream.
+    number = str(lap['DriverNumber'])
+    start = lap['LapStartTime'].total_seconds()
+    lap_time = lap['Time'].total_seconds() - start
+
+    car_time, car = _window(session.car_data[number], start, start + lap_time,
+                            ['Speed', 'Throttle', 'Brake', 'nGear', 'RPM', 'DRS'])
+    pos_time, pos = _window(session.pos_data[number], start, start + lap_time, ['X', 'Y'])
+
+    time_sec = np.union1d(np.concatenate([car_time, pos_time]), [0.0, lap_time])
+    time_sec = time_sec[(time_sec >= 0) & (time_sec <= lap_time)]
+
+    channels = {
+        "x": np.interp(time_sec, pos_time, pos['X']),
+        "y": np.interp(time_sec, pos_time, pos['Y']),
+        "speed": np.interp(time_sec, car_time, car['Speed']),
+        "throttle": np.interp(time_sec, car_time, car['Throttle']),
+        "brake": np.interp(time_sec, car_time, car['Brake']),
+    }
+    # Get auxillary data, held from the last car sample
+    last = np.clip(np.searchsorted(car_time, time_sec, side="right") - 1, 0, len(car_time) - 1)
+    channels["gear"] = car['nGear'][last]
+    channels["rpm"] = np.interp(time_sec, car_time, car['RPM'])
+    channels["drs"] = car['DRS'][last]
+    return time_sec, channels
+
+def _replay_lap(session, driver):
+    # The driver's fastest lap as (lap, samples), None without a usable lap
+    lap = session.laps.pick_drivers(driver).pick_fastest()
+    if lap is None or lap.empty or lap['LapStartTime'] != lap['LapStartTime'] or lap['Time'] != lap['Time']:
+        return None
+    if str(lap['DriverNumber']) not in session.car_data or str(lap['DriverNumber']) not in session.pos_data:
+        return None
+    return _lap_samples(session, lap)
+
+def resample_laps(samples, hz: int = REPLAY_HZ):
+    # Resample any number of laps onto one shared timeline in one pass.
+    #
+    # The laps are laid end to end on a single time axis, each shifted past
+    # the end of the one before, so one np.interp / searchsorted call over a
+    # stacked (cars x samples) query covers every car at once. A car whose
+    # lap is shorter than the longest one holds its final sample.
+    totals = np.array([time_sec[-1] for time_sec, _ in samples])
+
+    # Target 60Hz timeline
+    new_time = np.arange(0, totals.max(), 1/hz)
+
+    offsets = np.arange(len(samples)) * (totals.max() + 1.0)
+    flat_time = np.concatenate([time_sec + offset for (time_sec, _), offset in zip(samples, offsets)])
+    query = (np.minimum(new_time[None, :], totals[:, None]) + offsets[:, None]).ravel()
+    shape = (len(samples), len(new_time))
+
+    # Interpolate everything
+    resampled = {}
+    for name in INTERPOLATED_CHANNELS:
+        flat = np.concatenate([channels[name] for _, channels in samples])
+        resampled[name] = np.interp(query, flat_time, flat).reshape(shape)
+
+    # Gear and DRS syncing, both are steps rather than smooth signals
+    indices = np.searchsorted(flat_time, query, side="right") - 1
+    indices = np.clip(indices, 0, len(flat_time)-1)
+    for name in STEPPED_CHANNELS:
+        flat = np.concatenate([channels[name] for _, channels in samples])
+        resampled[name] = flat[indices].reshape(shape)
+
+    return new_time, totals, resampled
+
+@uses("laps", "results", "car_data", "pos_data", "messages")
+def QualiReplay(year: int,gp: str,drivers=None,top: int = REPLAY_TOP):
+    # Fastest qualifying laps of several drivers (default: the top ten) on one
+    # shared REPLAY_HZ timeline, as numpy arrays with one row per car.
+    # Each driver's lap is resampled once per session and kept with it, so
+    # later replays of the session only stack arrays.
+    session = load_for(QualiReplay, year, gp, "Q")
+
+    if not drivers:
+        drivers = list(session.results["Abbreviation"].iloc[:top])
+
+    laps = _replay_laps.setdefault(session, {})
+    missing = [driver for driver in drivers if driver not in laps]
+    if missing:
+        # Drivers without a timed lap are left out of the replay
+        samples = {driver: _replay_lap(session, driver) for driver in missing}
+        found = [driver for driver in missing if samples[driver] is not None]
+        computed = {driver: None for driver in missing}
+        if found:
+            new_time, totals, resampled = resample_laps([samples[driver] for driver in found])
+            for i, driver in enumerate(found):
+                n = len(np.arange(0, totals[i], 1/REPLAY_HZ))
+                computed[driver] = (totals[i], {name: values[i, :n] for name, values in resampled.items()})
+        # Published in one go once every lap is done: other requests reading
+        # the dict meanwhile never see a half-filled (or failed) set of laps
+        laps.update(computed)
+
+    codes = [driver for driver in drivers if laps.get(driver) is not None]
+    if not codes:
+        raise ValueError(f"No timed qualifying laps for {', '.join(map(str, drivers))}")
+
+    # A car whose lap is shorter than the longest one holds its final sample
+    totals = np.array([laps[driver][0] for driver in codes])
+    new_time = np.arange(0, totals.max(), 1/REPLAY_HZ)
+    resampled = {
+        name: np.stack([np.pad(laps[driver][1][name], (0, len(new_time) - len(laps[driver][1][name])), mode="edge")
+                        for driver in codes])
+        for name in INTERPOLATED_CHANNELS + STEPPED_CHANNELS
+    }
+    return {"drivers": codes, "lap_times": totals, "t": new_time, **resampled}
+
+def QualiLapReplay(year: int,gp: str,driver: str):
+    # Fastest qualifying lap of one driver resampled to REPLAY_HZ
+    return QualiReplay(year, gp, [driver])
 
 def DriverVSDriverQuali(year: int,gp: str,DriverA: str,DriverB: str):
-    
-    print("To be done")
+    # Both drivers' fastest laps on one timeline, for a ghost car replay
+    payload, _ = QualiReplayPayload(year, gp, [DriverA, DriverB])
+    return jsonify(replay_to_json(decode_replay_binary(payload)))
 
 def DriverTelemetryVisualised(year: int,gp: str,driver: str):
-    session = fastf1.get_session(year, gp, "Q")
-    session.load(telemetry=True)
+    payload, _ = QualiLapReplayPayload(year, gp, driver)
+    return jsonify(replay_to_json(decode_replay_binary(payload)))
 
-    lap = session.laps.pick_drivers(driver).pick_fastest()
-    tel = lap.get_telemetry()[['X', 'Y', 'Time', 'Speed', 'Throttle', 'Brake','nGear','RPM','DRS']].dropna()
+def replay_to_json(replay: dict) -> dict:
+    # Plain lists for jsonify; float32 samples are rounded so they don't
+    # print as 123.45600128173828. A single car keeps the flat layout of
+    # one list per channel and a scalar lap_time.
+    single = len(replay["drivers"]) == 1
+    data = {"drivers": list(replay["drivers"])}
 
-    # Convert to seconds from lap start
-    time_sec = tel['Time'].dt.total_seconds().to_numpy()
-    x = tel['X'].to_numpy()
-    y = tel['Y'].to_numpy()
+    for name, value in replay.items():
+        if name == "drivers":
+            continue
+        if value.dtype.kind == "f":
+            value = np.round(value.astype(float), 3)
+        if single and name not in SHARED_COLUMNS:
+            value = value[0]
+        data[name] = value.tolist()
 
-    # Normalize time to start at 0
-    time_sec = time_sec - time_sec[0]
+    if single:
+        data["lap_time"] = data.pop("lap_times")
+    return data
 
-    # ---- REMOVE DUPLICATE TIMESTAMPS ----
-    unique_indices = np.unique(time_sec, return_index=True)[1]
-    time_sec = time_sec[unique_indices]
-    x = x[unique_indices]
-    y = y[unique_indices]
+def encode_replay_binary(replay: dict) -> bytes:
+    # Compact little-endian column buffers that the browser can wrap in
+    # Float32Array / Uint8Array views without parsing any text.
+    #
+    # Header (16 bytes):  magic "F1RP", uint16 version, uint16 column count,
+    #                     uint32 sample count, uint16 car count, 2 padding bytes
+    # Per car (8 bytes):  4 byte ascii driver code, float32 lap time
+    # Per column (12 bytes): 8 byte ascii name, uint8 dtype (0 = float32,
+    #                     1 = uint8), uint8 shared (one row for all cars),
+    #                     2 padding bytes
+    # Then each column's samples, car after car, padded to a multiple of
+    # 4 bytes so every Float32Array starts on an aligned offset.
+    drivers = replay["drivers"]
+    n = len(replay["t"])
+    parts = [struct.pack("<4sHHIH2x", REPLAY_MAGIC, REPLAY_VERSION, len(REPLAY_COLUMNS), n, len(drivers))]
 
-    # Target 60Hz timeline
-    total_time = time_sec[-1]
-    new_time = np.arange(0, total_time, 1/60)
+    for driver, lap_time in zip(drivers, replay["lap_times"]):
+        parts.append(struct.pack("<4sf", str(driver).encode("ascii"), lap_time))
 
-    # Interpolate cleanly
-    new_x = np.interp(new_time, time_sec, x)
-    new_y = np.interp(new_time, time_sec, y)
-    speed = tel['Speed'].to_numpy()
-    throttle = tel['Throttle'].to_numpy()
-    brake = tel['Brake'].to_numpy()
+    for name, kind in REPLAY_COLUMNS:
+        parts.append(struct.pack("<8sBB2x", name.encode("ascii"), 0 if kind == "f" else 1, name in SHARED_COLUMNS))
 
-    # Get auxillary data
-    gear = tel['nGear'].to_numpy()
-    rpm = tel['RPM'].to_numpy()
-    drs = tel['DRS'].to_numpy()
+    for name, kind in REPLAY_COLUMNS:
+        if kind == "f":
+            column = np.asarray(replay[name], dtype="<f4")
+        else:
+            column = np.clip(np.nan_to_num(np.asarray(replay[name], dtype=float)), 0, 255).astype(np.uint8)
+        data = column.tobytes()
+        parts.append(data + b"\0" * (-len(data) % 4))
 
-    # Gear syncing
-    indices = np.searchsorted(time_sec, new_time, side="right") - 1
-    indices = np.clip(indices, 0, len(gear)-1)
+    return b"".join(parts)
 
-    synced_gear = gear[indices]
+def decode_replay_binary(data: bytes) -> dict:
+    # Inverse of encode_replay_binary, returns numpy arrays
+    magic, version, n_columns, n, n_cars = struct.unpack_from("<4sHHIH2x", data)
+    if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+        raise ValueError("Not a replay payload of a supported version")
 
-    # Interpolate everything
-    new_speed = np.interp(new_time, time_sec, speed)
-    new_throttle = np.interp(new_time, time_sec, throttle)
-    new_brake = np.interp(new_time, time_sec, brake)
-
-    return jsonify({
-        "x": new_x.tolist(),
-        "y": new_y.tolist(),
-        "t": new_time.tolist(),
-        "speed": new_speed.tolist(),
-        "throttle": new_throttle.tolist(),
-        "brake": new_brake.tolist(),
-        "gear": synced_gear.tolist(),
-        "rpm": rpm.tolist(),
-        "drs": drs.tolist(),
-        "lap_time": float(total_time)
-    })
\ No newline at end of file
+    cars = [struct.unpack_from("<4sf", data, 16 + c * 8) for c in range(n_cars)]
+    replay = {
+        "drivers": [driver.rstrip(b"\0").decode("ascii") for driver, _ in cars],
+        "lap_times": np.array([lap_time for _, lap_time in cars], dtype="<f4"),
+    }
+
+    descriptors = 16 + n_cars * 8
+    offset = descriptors + n_columns * 12
+    for c in range(n_columns):
+        name, kind, shared = struct.unpack_from("<8sBB2x", data, descriptors + c * 12)
+        rows = 1 if shared else n_cars
+        dtype = "<f4" if kind == 0 else np.uint8
+        column = np.frombuffer(data, dtype=dtype, count=rows * n, offset=offset)
+        replay[name.rstrip(b"\0").decode("ascii")] = column if shared else column.reshape(n_cars, n)
+        offset += column.nbytes + (-column.nbytes % 4)
+
+    return replay
+
+def QualiReplayPayload(year: int,gp: str,drivers=None,top: int = REPLAY_TOP):
+    # Binary replay and whether it is final. Payloads of sessions whose data
+    # can no longer change are kept on disk, so only their first view loads
+    # the session.
+    if drivers:
+        drivers = [str(d).strip().upper() for d in drivers]
+    key = (int(year), str(gp).strip().lower(), tuple(drivers) if drivers else ("top", int(top)))
+    payload = replay_cache.get(key)
+    count_cache(replay_cache.name, payload is not None)
+    if payload is not None:
+        return payload, True
+
+    payload = encode_replay_binary(QualiReplay(year, gp, drivers, top))
+    final = session_is_historical(year, gp, "Q")
+    if final:
+        replay_cache.put(key, payload)
+    return payload, final
+
+def QualiLapReplayPayload(year: int,gp: str,driver: str):
+    return QualiReplayPayload(year, gp, [driver])
@@ -0,0 +1,210 @@
+"""Where the time of a request goes.
+
+``span(name)`` times a block of code. Spans are collected per request (the
+collector is a context variable, which run_sections copies into its worker
+threads) and sent back in a ``Server-Timing`` header, so the browser's
+network panel shows session load, view, render and template time of every
+response. Every span, and every request, is also added to a histogram.
+
+Streamed pages send their headers before their sections run, so their
+``Server-Timing`` only covers the page shell (marked ``stream;desc="page
+shell only"``). Their request histogram entry is recorded, and their full
+timing logged at debug level, once the last chunk is out.
+
+``prometheus_text()`` renders those histograms and the cache counters in
+the Prometheus text format for ``/metrics``.
+"""
+import bisect
+import contextvars
+import functools
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Histogram bucket bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Spans of the current request, None outside of one
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+
+_lock = threading.Lock()
+
+
+# -------------------- Histograms --------------------
+
+class Histogram:
+    """Prometheus style cumulative histogram with one label"""
+
+    def __init__(self, name: str, help: str, label: str, buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        # label value -> [per bucket counts (last one is +Inf), sum]
+        self._series = {}
+
+    def observe(self, value: str, seconds: float):
+        with _lock:
+            series = self._series.get(value)
+            if series is None:
+                series = self._series[value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, seconds)] += 1
+            series[1] += seconds
+
+    def lines(self) -> list:
+        with _lock:
+            series = {value: (list(counts), total) for value, (counts, total) in self._series.items()}
+
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for value, (counts, total) in sorted(series.items()):
+            label = f'{self.label}="{_escape(value)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+
+span_seconds = Histogram("f1_span_seconds", "Time spent in instrumented code paths.", "span")
+request_seconds = Histogram("f1_request_seconds", "Time to handle a request, by endpoint.", "endpoint")
+
+# (cache name, "hit" or "miss") -> lookups
+_cache_lookups = defaultdict(int)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# -------------------- Spans --------------------
+
+@contextmanager
+def span(name: str):
+    """Time the enclosed block as ``name``"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        span_seconds.observe(name, elapsed)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((name, elapsed))
+
+
+def timed(name: str = None):
+    """Decorator form of ``span``, named after the function by default"""
+    def decorate(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def start_request():
+    """Collect the spans of the request being handled in this context"""
+    _request_spans.set([])
+
+
+def request_collector():
+    """The current request's span list, for code that runs after the view returned"""
+    return _request_spans.get()
+
+
+def resume_request(collector):
+    """Collect spans into ``collector`` again, e.g. while a streamed body is produced"""
+    _request_spans.set(collector)
+
+
+def request_spans() -> list:
+    """``(name, seconds)`` of every span of the current request so far"""
+    return list(_request_spans.get() or ())
+
+
+def count_cache(cache: str, hit: bool):
+    with _lock:
+        _cache_lookups[(cache, "hit" if hit else "miss")] += 1
+
+
+def cache_lookups() -> dict:
+    with _lock:
+        return dict(_cache_lookups)
+
+
+# -------------------- Export --------------------
+
+def _token(name: str) -> str:
+    # Server-Timing metric names are HTTP tokens
+    return re.sub(r"[^A-Za-z0-9!#$%&'*+.^_`|~-]", "_", name)
+
+
+def server_timing(spans, total: float = None) -> str:
+    """``Server-Timing`` header value, one entry per span name.
+
+    Repeated spans (e.g. several renders) are summed and their count is
+    given as the description.
+    """
+    durations = {}
+    counts = defaultdict(int)
+    for name, seconds in spans:
+        durations[name] = durations.get(name, 0.0) + seconds
+        counts[name] += 1
+
+    entries = []
+    for name, seconds in durations.items():
+        entry = f"{_token(name)};dur={seconds * 1000:.1f}"
+        if counts[name] > 1:
+            entry += f';desc="{counts[name]}x"'
+        entries.append(entry)
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def _gauge(name: str, help: str, value, kind: str = "gauge") -> list:
+    return [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {value}"]
+
+
+def prometheus_text(session_stats: dict = None) -> str:
+    """Every histogram and counter in the Prometheus text exposition format.
+
+    ``session_stats`` is ``session_load_stats()``: session cache hits and
+    misses, loads, and the loads in flight right now.
+    """
+    lines = span_seconds.lines() + request_seconds.lines()
+
+    lookups = cache_lookups()
+    if lookups:
+        lines += ["# HELP f1_cache_lookups_total Lookups in the derived data caches.",
+                  "# TYPE f1_cache_lookups_total counter"]
+        for (cache, result), count in sorted(lookups.items()):
+            lines.append(f'f1_cache_lookups_total{{cache="{_escape(cache)}",result="{result}"}} {count}')
+
+        lines += ["# HELP f1_cache_hit_ratio Share of cache lookups that were hits.",
+                  "# TYPE f1_cache_hit_ratio gauge"]
+        for cache in sorted({cache for cache, _ in lookups}):
+            hits, misses = lookups.get((cache, "hit"), 0), lookups.get((cache, "miss"), 0)
+            lines.append(f'f1_cache_hit_ratio{{cache="{_escape(cache)}"}} {hits / (hits + misses):.4f}')
+
+    if session_stats is not None:
+        hits, misses = session_stats["hits"], session_stats["misses"]
+        lines += _gauge("f1_session_cache_hits_total", "Session requests served from memory.", hits, "counter")
+        lines += _gauge("f1_session_cache_misses_total", "Session requests that needed a load.", misses, "counter")
+        lines += _gauge("f1_session_cache_hit_ratio", "Share of session requests served from memory.",
+                        f"{hits / (hits + misses):.4f}" if hits + misses else "NaN")
+        lines += _gauge("f1_session_loads_total", "Session loads run.", session_stats["loads"], "counter")
+        lines += _gauge("f1_session_loads_coalesced_total", "Requests that shared another thread's load.",
+                        session_stats["coalesced"], "counter")
+        lines += _gauge("f1_session_loads_in_flight", "Session loads running right now.", session_stats["in_flight"])
+        lines += _gauge("f1_session_load_waiters", "Requests waiting on a running load.", session_stats["waiting"])
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,252 @@
+"""On-demand profiling of single requests.
+
+``profile_call(name, fn)`` runs ``fn`` with a sampling CPU profiler and/or
+tracemalloc switched on and saves the artifacts under PROFILE_DIR:
+
+- ``<id>.speedscope.json``: the CPU samples in speedscope's file format
+  (open it at https://www.speedscope.app), one profile per thread.
+- ``<id>.alloc.json``: peak traced memory and the top allocation sites of
+  what the request allocated and still holds at the end (usually the
+  session it loaded), by line and by call stack.
+
+The sampler reads ``sys._current_frames()`` from a background thread, so it
+sees the calling thread and the section pool threads working for it, but
+not the render processes. Only one request is profiled at a time, since
+tracemalloc is process wide.
+"""
+import datetime
+import json
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+
+# Where artifacts are written (override with F1_PROFILE_DIR)
+PROFILE_DIR = os.environ.get(
+    "F1_PROFILE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "profiles"),
+)
+
+# Seconds between CPU samples (override with F1_PROFILE_INTERVAL_MS)
+SAMPLE_INTERVAL = float(os.environ.get("F1_PROFILE_INTERVAL_MS", "5")) / 1000
+
+# Allocation sites listed in the memory report
+TOP_ALLOCATIONS = 25
+
+# Frames kept per allocation traceback
+TRACEBACK_FRAMES = 12
+
+# Files written for every profile
+ARTIFACTS = ("speedscope.json", "alloc.json")
+
+# Section pool threads, see executor.py
+SECTION_THREAD_PREFIX = "section"
+
+_PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{6}-[A-Za-z0-9_]+-[0-9a-f]{8}$")
+
+# Held while a request is being profiled
+_active = threading.Lock()
+
+
+# -------------------- CPU sampling --------------------
+
+class SamplingProfiler:
+    """Samples the stacks of one thread and of busy section threads"""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames = []
+        self._frame_index = {}
+        # thread name -> ([stack], [weight])
+        self.samples = {}
+        self.duration = 0.0
+        self._started = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            self._sample(now - last)
+            last = now
+
+    def _targets(self) -> dict:
+        names = {self.thread_id: "request"}
+        for thread in threading.enumerate():
+            if thread.name.startswith(SECTION_THREAD_PREFIX):
+                names[thread.ident] = thread.name
+        return names
+
+    def _sample(self, weight: float):
+        targets = self._targets()
+        for ident, frame in sys._current_frames().items():
+            name = targets.get(ident)
+            if name is None:
+                continue
+            stack = self._stack(frame)
+            if name != "request" and not self._busy(stack):
+                continue
+            stacks, weights = self.samples.setdefault(name, ([], []))
+            stacks.append(stack)
+            weights.append(weight)
+
+    def _busy(self, stack) -> bool:
+        # Idle pool workers sit in queue.get(); busy ones are inside _WorkItem.run
+        return any(
+            self.frames[i]["name"] == "run" and self.frames[i]["file"].endswith(os.path.join("futures", "thread.py"))
+            for i in stack
+        )
+
+    def _stack(self, frame) -> list:
+        """Frame indices from the outermost call to the innermost"""
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_name, code.co_filename, code.co_firstlineno)
+            index = self._frame_index.get(key)
+            if index is None:
+                index = self._frame_index[key] = len(self.frames)
+                self.frames.append({"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno})
+            stack.append(index)
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def to_speedscope(self, name: str) -> dict:
+        profiles = []
+        for thread, (stacks, weights) in self.samples.items():
+            profiles.append({
+                "type": "sampled",
+                "name": thread,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": stacks,
+                "weights": weights,
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "f1-dashboard",
+            "activeProfileIndex": 0,
+            "shared": {"frames": self.frames},
+            "profiles": profiles,
+        }
+
+
+# -------------------- Memory --------------------
+
+def allocation_report(snapshot, peak: int, top: int = TOP_ALLOCATIONS) -> dict:
+    """Peak traced bytes plus the top allocation sites still held in ``snapshot``"""
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+    by_line = snapshot.statistics("lineno")
+    by_stack = snapshot.statistics("traceback")
+    return {
+        "peak_kib": round(peak / 1024, 1),
+        "held_kib": round(sum(stat.size for stat in by_line) / 1024, 1),
+        "by_line": [
+            {"file": stat.traceback[0].filename, "line": stat.traceback[0].lineno,
+             "size_kib": round(stat.size / 1024, 1), "count": stat.count}
+            for stat in by_line[:top]
+        ],
+        "by_stack": [
+            {"size_kib": round(stat.size / 1024, 1), "count": stat.count,
+             "stack": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]}
+            for stat in by_stack[:top]
+        ],
+    }
+
+
+# -------------------- Public API --------------------
+
+def _new_id(name: str) -> str:
+    stamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+    return f"{stamp}-{re.sub(r'[^A-Za-z0-9_]', '_', name)}-{uuid.uuid4().hex[:8]}"
+
+
+def profile_call(name: str, fn, cpu: bool = True, memory: bool = True):
+    """Run ``fn()`` under the CPU and/or memory profilers.
+
+    Returns ``(result, profile id)``. The id is None when another request is
+    being profiled already, in which case ``fn`` just runs. tracemalloc
+    slows allocation heavy code down many times over, so ``memory=False``
+    gives CPU profiles that are true to the request's normal timing.
+    """
+    if not _active.acquire(blocking=False):
+        return fn(), None
+
+    try:
+        profile_id = _new_id(name)
+        profiler = SamplingProfiler(threading.get_ident()) if cpu else None
+
+        already_tracing = tracemalloc.is_tracing()
+        if memory:
+            if not already_tracing:
+                tracemalloc.start(TRACEBACK_FRAMES)
+            tracemalloc.reset_peak()
+        if profiler is not None:
+            profiler.start()
+        start = time.perf_counter()
+        try:
+            result = fn()
+        finally:
+            seconds = time.perf_counter() - start
+            if profiler is not None:
+                profiler.stop()
+            if memory:
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                if not already_tracing:
+                    tracemalloc.stop()
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        if profiler is not None:
+            with open(profile_path(profile_id, "speedscope.json"), "w") as f:
+                json.dump(profiler.to_speedscope(f"{name} {profile_id}"), f)
+        if memory:
+            report = allocation_report(snapshot, peak)
+            report.update(name=name, seconds=round(seconds, 4))
+            with open(profile_path(profile_id, "alloc.json"), "w") as f:
+                json.dump(report, f, indent=1)
+        return result, profile_id
+    finally:
+        _active.release()
+
+
+def profile_path(profile_id: str, artifact: str):
+    """File of one artifact of a profile, or None for ids that can't be ours"""
+    if not _PROFILE_ID.match(profile_id) or artifact not in ARTIFACTS:
+        return None
+    return os.path.join(PROFILE_DIR, f"{profile_id}.{artifact}")
+
+
+def list_profiles() -> dict:
+    """``{profile id: [artifact, ...]}`` of the saved profiles, newest first"""
+    try:
+        names = os.listdir(PROFILE_DIR)
+    except FileNotFoundError:
+        return {}
+    profiles = {}
+    for name in sorted(names, reverse=True):
+        profile_id, _, artifact = name.partition(".")
+        if artifact in ARTIFACTS:
+            profiles.setdefault(profile_id, []).append(artifact)
+    return profiles
@@ -0,0 +1,633 @@
+"""Where sessions come from.
+
+``sessions.py`` asks the active provider for a session object and then loads
+it, caches it and hands it to the views as usual. Three providers exist:
+
+- ``FastF1Provider``: the live FastF1 API (the default), in
+  session_provider.py with the interface, so choosing it imports nothing
+  from here.
+- ``SyntheticProvider``: generated sessions with realistic laps, results,
+  car data and position data for any grid size and lap count. Needs no
+  network or cache, so tests and benchmarks run anywhere.
+- ``FixtureProvider``: sessions recorded from a real FastF1 cache with
+  ``record_fixture``, trimmed to a few drivers and laps.
+
+The offline providers return real ``fastf1.core.Session`` objects (with
+``Laps``, ``SessionResults`` and ``Telemetry`` inside), so ``pick_fastest``,
+``get_car_data``, ``get_telemetry`` and fastf1.plotting work unchanged.
+
+Select one with ``sessions.set_session_provider`` or with F1_SESSION_PROVIDER
+set to ``fastf1``, ``synthetic`` or ``fixtures:<directory>``.
+"""
+import gzip
+import itertools
+import json
+import os
+import pickle
+import re
+import threading
+import weakref
+import zlib
+
+import fastf1
+import fastf1._api
+import numpy as np
+import pandas as pd
+from fastf1.core import Laps, Session, SessionResults, Telemetry
+from fastf1.events import Event, EventSchedule
+from fastf1.mvapi import CircuitInfo
+
+from visualizations.session_provider import SessionProvider, FastF1Provider, provider_from_env
+
+
+# -------------------- Constants --------------------
+
+# Grid used by the synthetic provider: (abbreviation, number, team, colour)
+SYNTHETIC_GRID = [
+    ("VER", "1", "Red Bull Racing", "3671C6"), ("PER", "11", "Red Bull Racing", "3671C6"),
+    ("LEC", "16", "Ferrari", "E8002D"), ("SAI", "55", "Ferrari", "E8002D"),
+    ("NOR", "4", "McLaren", "FF8000"), ("PIA", "81", "McLaren", "FF8000"),
+    ("HAM", "44", "Mercedes", "27F4D2"), ("RUS", "63", "Mercedes", "27F4D2"),
+    ("ALO", "14", "Aston Martin", "229971"), ("STR", "18", "Aston Martin", "229971"),
+    ("GAS", "10", "Alpine", "FF87BC"), ("OCO", "31", "Alpine", "FF87BC"),
+    ("ALB", "23", "Williams", "64C4FF"), ("SAR", "2", "Williams", "64C4FF"),
+    ("TSU", "22", "RB", "6692FF"), ("RIC", "3", "RB", "6692FF"),
+    ("HUL", "27", "Haas F1 Team", "B6BABD"), ("MAG", "20", "Haas F1 Team", "B6BABD"),
+    ("BOT", "77", "Kick Sauber", "52E252"), ("ZHO", "24", "Kick Sauber", "52E252"),
+    # Reserve drivers, for grids of up to 24 cars
+    ("BEA", "87", "Haas F1 Team", "B6BABD"), ("COL", "43", "Williams", "64C4FF"),
+    ("LAW", "30", "RB", "6692FF"), ("DOO", "7", "Alpine", "FF87BC"),
+]
+
+# Championship points for the top ten of a race
+RACE_POINTS = [25, 18, 15, 12, 10, 8, 6, 4, 2, 1]
+
+# Events of a synthetic season, in round order. Other names still work,
+# they just aren't on the calendar.
+SYNTHETIC_CALENDAR = [
+    "Bahrain", "Saudi Arabia", "Australia", "Japan", "China", "Miami", "Imola", "Monaco",
+    "Canada", "Spain", "Austria", "Britain", "Hungary", "Belgium", "Netherlands", "Monza",
+    "Azerbaijan", "Singapore", "Austin", "Mexico", "Brazil", "Las Vegas", "Qatar", "Abu Dhabi",
+]
+
+# Session names of a conventional weekend, in order
+WEEKEND = ["Practice 1", "Practice 2", "Practice 3", "Qualifying", "Race"]
+
+# Laps per driver in non-race sessions when not given
+DEFAULT_SESSION_LAPS = {"Race": 57, "Qualifying": 12}
+DEFAULT_PRACTICE_LAPS = 24
+
+# Vehicle model of the synthetic track (m/s, m/s^2)
+TOP_SPEED = 92.0
+LATERAL_GRIP = 40.0
+ACCELERATION = 11.0
+BRAKING = 45.0
+
+# Session time (s) at which the first lap starts
+SESSION_START = 3600.0
+
+# Written next to recorded fixtures, maps file names to their sessions
+FIXTURE_INDEX = "index.json"
+
+
+# -------------------- Offline session --------------------
+
+# fastf1.plotting asks the live timing API for each session's driver list,
+# by the session's api_path. Every offline session gets an api_path of its
+# own under OFFLINE_PATH_PREFIX and registers its driver list here; the
+# lookup below answers for those paths and leaves every other path to
+# FastF1. It is installed when the first offline session is created.
+OFFLINE_PATH_PREFIX = "offline/"
+_offline_driver_info = {}
+_offline_ids = itertools.count(1)
+_api_driver_info = None
+_install_lock = threading.Lock()
+
+
+def _driver_info(path, *args, **kwargs):
+    if path.startswith(OFFLINE_PATH_PREFIX):
+        return _offline_driver_info.get(path, {})
+    return _api_driver_info(path, *args, **kwargs)
+
+
+def _install_driver_info():
+    global _api_driver_info
+    with _install_lock:
+        if _api_driver_info is None:
+            _api_driver_info = fastf1._api.driver_info
+            fastf1._api.driver_info = _driver_info
+
+
+class OfflineSession(Session):
+    """A FastF1 session whose data comes from memory instead of the API.
+
+    ``parts`` is the dict built by ``synthetic_parts`` or read from a
+    fixture, or a function returning it, which is then only called by the
+    first ``load()``. That fills in every part at once, and
+    ``f1_api_support`` is False so nothing ever reaches the API.
+    """
+
+    def __init__(self, event, session_name, parts):
+        super().__init__(event, session_name, f1_api_support=False)
+        self._parts = parts
+        # Never the path of a real session, and new for every session object,
+        # so fastf1.plotting builds a fresh driver mapping for each grid
+        self.api_path = f"{OFFLINE_PATH_PREFIX}{next(_offline_ids)}/{self.api_path}"
+        weakref.finalize(self, _offline_driver_info.pop, self.api_path, None)
+        _install_driver_info()
+
+    def _get_parts(self) -> dict:
+        if callable(self._parts):
+            self._parts = self._parts()
+        return self._parts
+
+    def load(self, *, laps=True, telemetry=True, weather=True, messages=True, livedata=None):
+        parts = self._get_parts()
+        self._session_info = parts["session_info"]
+        self._session_status = parts["session_status"]
+        self._track_status = parts["track_status"]
+        self._total_laps = parts["total_laps"]
+        self._t0_date = parts["t0_date"]
+        self._session_start_time = parts["session_start_time"]
+        self._weather_data = parts["weather_data"]
+        self._race_control_messages = parts["race_control_messages"]
+        self._results = SessionResults(parts["results"], _force_default_cols=True)
+        self._laps = Laps(parts["laps"], session=self, _force_default_cols=True)
+        self._car_data = {number: Telemetry(data, session=self, driver=number)
+                          for number, data in parts["car_data"].items()}
+        self._pos_data = {number: Telemetry(data, session=self, driver=number)
+                          for number, data in parts["pos_data"].items()}
+
+        _offline_driver_info[self.api_path] = {
+            str(row["DriverNumber"]): {
+                "RacingNumber": str(row["DriverNumber"]), "Tla": row["Abbreviation"],
+                "FirstName": row["FirstName"], "LastName": row["LastName"],
+                "TeamName": row["TeamName"], "TeamColour": row["TeamColor"] or "FFFFFF",
+            }
+            for _, row in self._results.iterrows()
+        }
+
+    def get_circuit_info(self):
+        circuit = self._get_parts().get("circuit")
+        if circuit is None:
+            return None
+        return CircuitInfo(
+            corners=circuit["corners"].copy(),
+            marshal_lights=circuit["marshal_lights"].copy(),
+            marshal_sectors=circuit["marshal_sectors"].copy(),
+            rotation=circuit["rotation"],
+        )
+
+
+def build_session(parts: dict) -> OfflineSession:
+    """Session object for a parts dict (synthetic or recorded)"""
+    event = Event(pd.Series(parts["event"]), year=parts["year"])
+    return OfflineSession(event, parts["session_name"], parts)
+
+
+def _event(year, fields) -> Event:
+    return Event(pd.Series(fields), year=int(year))
+
+
+def _schedule(year, events) -> EventSchedule:
+    schedule = EventSchedule(pd.DataFrame(list(events)), year=int(year))
+    return schedule.sort_values("RoundNumber").reset_index(drop=True)
+
+
+def _slug(text) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", str(text).lower()).strip("_")
+
+
+def _seed(*values) -> int:
+    return zlib.crc32(repr(values).encode("utf-8"))
+
+
+# -------------------- Providers --------------------
+
+class SyntheticProvider(SessionProvider):
+    """Generated sessions. The same arguments always give the same data.
+
+    ``n_laps`` is a lap count for every session or a ``{session name: laps}``
+    dict; sessions without one use DEFAULT_SESSION_LAPS.
+    """
+
+    def __init__(self, n_drivers: int = 20, n_laps=None, hz: float = 4.0, seed: int = 0):
+        if not 1 <= n_drivers <= len(SYNTHETIC_GRID):
+            raise ValueError(f"n_drivers must be between 1 and {len(SYNTHETIC_GRID)}")
+        self.n_drivers = n_drivers
+        self.n_laps = n_laps
+        self.hz = hz
+        self.seed = seed
+
+    def get_session(self, year, gp, session_type):
+        # The data itself is only generated when the session is loaded
+        event = _event(year, _event_fields(year, gp))
+        return OfflineSession(event, event.get_session_name(session_type), lambda: synthetic_parts(
+            year, gp, session_type,
+            n_drivers=self.n_drivers, n_laps=self.n_laps, hz=self.hz, seed=self.seed,
+        ))
+
+    def get_event_schedule(self, year, include_testing=True):
+        # There is no synthetic testing
+        return _schedule(year, (_event_fields(year, name) for name in SYNTHETIC_CALENDAR))
+
+
+class FixtureProvider(SessionProvider):
+    """Sessions recorded with ``record_fixture`` into ``directory``"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _index(self) -> dict:
+        try:
+            with open(os.path.join(self.directory, FIXTURE_INDEX)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def find(self, year, gp, session_type) -> str:
+        """File name of the fixture for a session, matching gp like FastF1 loosely does"""
+        wanted = str(gp).strip().lower()
+        for filename, entry in self._index().items():
+            if entry["year"] != int(year):
+                continue
+            names = [entry["event"], entry["location"], entry["country"], str(entry["round"])]
+            if not any(wanted == name.lower() or wanted in name.lower() for name in names):
+                continue
+            event = _event(entry["year"], entry["event_fields"])
+            try:
+                if event.get_session_name(session_type) == entry["session"]:
+                    return filename
+            except ValueError:
+                continue
+        raise ValueError(f"No fixture for {year} {gp} {session_type} in {self.directory}")
+
+    def get_event_schedule(self, year, include_testing=True):
+        """Every recorded event of ``year``"""
+        events = {}
+        for entry in self._index().values():
+            if entry["year"] == int(year):
+                events.setdefault(entry["event"], entry["event_fields"])
+        return _schedule(year, events.values())
+
+    def get_session(self, year, gp, session_type):
+        with gzip.open(os.path.join(self.directory, self.find(year, gp, session_type)), "rb") as f:
+            return build_session(pickle.load(f))
+
+
+# -------------------- Synthetic data --------------------
+
+def _track(rng):
+    """Closed track: xy (m), distance, speed limit profile (m/s) and lap time profile"""
+    theta = np.linspace(0, 2 * np.pi, 2001)[:-1]
+    wobble = 1 + 0.22 * np.sin(3 * theta + rng.uniform(0, 2 * np.pi)) + 0.08 * np.cos(7 * theta)
+    x = 900 * wobble * np.cos(theta) * 1.3
+    y = 900 * wobble * np.sin(theta)
+
+    ds = np.hypot(np.diff(x, append=x[0]), np.diff(y, append=y[0]))
+    distance = np.concatenate([[0.0], np.cumsum(ds)[:-1]])
+
+    # Curvature of the closed polyline
+    dx, dy = np.gradient(x), np.gradient(y)
+    ddx, ddy = np.gradient(dx), np.gradient(dy)
+    curvature = np.abs(dx * ddy - dy * ddx) / np.maximum((dx ** 2 + dy ** 2) ** 1.5, 1e-9)
+    speed = np.minimum(TOP_SPEED, np.sqrt(LATERAL_GRIP / np.maximum(curvature, 1e-6)))
+
+    # Acceleration and braking limits, twice round so the lap wraps cleanly
+    n = len(speed)
+    for _ in range(2):
+        for i in range(n):
+            speed[i] = min(speed[i], np.sqrt(speed[i - 1] ** 2 + 2 * ACCELERATION * ds[i - 1]))
+        for i in range(n - 1, -1, -1):
+            j = (i + 1) % n
+            speed[i] = min(speed[i], np.sqrt(speed[j] ** 2 + 2 * BRAKING * ds[i]))
+
+    lap_time = np.concatenate([[0.0], np.cumsum(ds / speed)[:-1]])
+    length = distance[-1] + ds[-1]
+    base_time = lap_time[-1] + ds[-1] / speed[-1]
+    return {"x": x, "y": y, "distance": distance, "speed": speed, "time": lap_time,
+            "length": length, "base_time": base_time, "curvature": curvature}
+
+
+def _corners(track) -> pd.DataFrame:
+    """Local curvature peaks, numbered along the lap"""
+    curvature = track["curvature"]
+    peak = (curvature > np.roll(curvature, 1)) & (curvature >= np.roll(curvature, -1)) & (track["speed"] < TOP_SPEED * 0.8)
+    idx = np.flatnonzero(peak)
+    return pd.DataFrame({
+        "X": track["x"][idx] * 10, "Y": track["y"][idx] * 10,
+        "Number": np.arange(1, len(idx) + 1), "Letter": "",
+        "Angle": np.degrees(np.arctan2(track["y"][idx], track["x"][idx])),
+        "Distance": track["distance"][idx],
+    })
+
+
+def _event_fields(year, gp) -> dict:
+    name = str(gp).strip()
+    if "grand prix" not in name.lower():
+        name = f"{name.title()} Grand Prix"
+    calendar = [f"{event} Grand Prix".lower() for event in SYNTHETIC_CALENDAR]
+    if name.lower() in calendar:
+        round_number = calendar.index(name.lower()) + 1
+    else:
+        round_number = _seed(name) % 24 + 1
+    race_day = pd.Timestamp(year=int(year), month=3, day=2) + pd.Timedelta(days=14 * (round_number - 1))
+    fields = {
+        "RoundNumber": round_number, "Country": name.replace(" Grand Prix", ""),
+        "Location": name.replace(" Grand Prix", ""), "OfficialEventName": f"FORMULA 1 {name.upper()} {year}",
+        "EventDate": race_day, "EventName": name, "EventFormat": "conventional", "F1ApiSupport": False,
+    }
+    offsets = [-2, -2, -1, -1, 0]
+    hours = [11.5, 15, 10.5, 14, 13]
+    for i, (session_name, day, hour) in enumerate(zip(WEEKEND, offsets, hours), start=1):
+        date = race_day + pd.Timedelta(days=day, hours=hour)
+        fields[f"Session{i}"] = session_name
+        fields[f"Session{i}Date"] = date.tz_localize("UTC")
+        fields[f"Session{i}DateUtc"] = date
+    return fields
+
+
+def _lap_plan(rng, session_name, n_laps, skill):
+    """Per driver: lap time factors and compounds, plus which laps are pushes"""
+    if session_name == "Race":
+        pit_lap = int(rng.integers(max(2, int(n_laps * 0.3)), max(3, int(n_laps * 0.6))))
+        lap_numbers = np.arange(1, n_laps + 1)
+        stint = np.where(lap_numbers <= pit_lap, 1, 2)
+        compound = np.where(stint == 1, "MEDIUM", "HARD")
+        tyre_life = np.where(stint == 1, lap_numbers, lap_numbers - pit_lap)
+        fuel = 105.0 * (1 - lap_numbers / n_laps)
+        deg = np.where(stint == 1, 0.0009, 0.0005)
+        factor = (1 + skill + deg * tyre_life + 0.00039 * fuel
+                  + rng.normal(0, 0.003, n_laps))
+        factor[0] *= 1.08                              # standing start
+        factor[pit_lap - 1] *= 1.12                    # in lap
+        factor[min(pit_lap, n_laps - 1)] *= 1.14       # out lap
+        push = np.ones(n_laps, dtype=bool)
+        pit_in = lap_numbers == pit_lap
+        return factor, compound, stint, tyre_life, push, pit_in
+
+    # Qualifying and practice: out lap, push lap, cool down lap, repeated
+    kind = np.arange(n_laps) % 3
+    push = kind == 1
+    factor = np.where(push, 1 + skill + rng.normal(0, 0.002, n_laps), np.where(kind == 0, 1.35, 1.45))
+    if session_name == "Qualifying":
+        # Later runs are quicker as the track evolves
+        factor = factor - push * np.linspace(0, 0.006, n_laps)
+    compound = np.full(n_laps, "SOFT" if session_name == "Qualifying" else "MEDIUM")
+    stint = np.arange(n_laps) // 3 + 1
+    tyre_life = kind + 1.0
+    pit_in = kind == 2
+    return factor, compound, stint, tyre_life, push, pit_in
+
+
+def synthetic_parts(year, gp, session_type, n_drivers=20, n_laps=None, hz=4.0, seed=0) -> dict:
+    """Generate the parts of one session. See SyntheticProvider."""
+    fields = _event_fields(year, gp)
+    event = _event(year, fields)
+    session_name = event.get_session_name(session_type)
+    if isinstance(n_laps, dict):
+        n_laps = n_laps.get(session_name)
+    if n_laps is None:
+        n_laps = DEFAULT_SESSION_LAPS.get(session_name, DEFAULT_PRACTICE_LAPS)
+
+    # The track and the drivers' pace belong to the event, the rest to the session
+    event_rng = np.random.default_rng(_seed(seed, int(year), fields["EventName"]))
+    rng = np.random.default_rng(_seed(seed, int(year), fields["EventName"], session_name))
+    track = _track(event_rng)
+    grid = SYNTHETIC_GRID[:n_drivers]
+    skills = np.sort(event_rng.normal(0.008, 0.006, n_drivers)) - 0.008
+
+    date = event.get_session_date(session_name, utc=True)
+    t0_date = date - pd.Timedelta(seconds=SESSION_START)
+    is_race = session_name == "Race"
+
+    laps_rows, car_data, pos_data = [], {}, {}
+    for d, (abb, number, team, _) in enumerate(grid):
+        factor, compound, stint, tyre_life, push, pit_in = _lap_plan(rng, session_name, n_laps, skills[d])
+        lap_times = track["base_time"] * factor
+        start = SESSION_START + (0.0 if is_race else d * 25.0)
+        lap_start = start + np.concatenate([[0.0], np.cumsum(lap_times)[:-1]])
+        lap_end = lap_start + lap_times
+
+        # Car data: regular samples over the driver's running, mapped to a
+        # point on the lap through the base lap time profile. Samples sit on
+        # one session-wide clock, like the live timing feed, so every driver's
+        # stream shares its timestamps (FastF1's driver-ahead join needs it)
+        for data, rate, phase in ((car_data, hz, 0.0), (pos_data, hz, 0.5)):
+            ticks = np.arange(np.ceil(lap_start[0] * rate - phase), np.ceil(lap_end[-1] * rate - phase))
+            session_time = (ticks + phase) / rate
+            lap = np.clip(np.searchsorted(lap_end, session_time, side="right"), 0, n_laps - 1)
+            base_time = (session_time - lap_start[lap]) / factor[lap]
+            distance = np.interp(base_time, track["time"], track["distance"])
+            frame = pd.DataFrame({
+                "Date": t0_date + pd.to_timedelta(session_time, unit="s"),
+                "SessionTime": pd.to_timedelta(session_time, unit="s"),
+                "Time": pd.to_timedelta(session_time - session_time[0], unit="s"),
+            })
+            if data is car_data:
+                speed = np.interp(distance, track["distance"], track["speed"]) / factor[lap] * 3.6
+                accel = np.gradient(speed) * rate
+                frame["RPM"] = 10500 + 1500 * ((speed % 35) / 35) + rng.normal(0, 60, len(speed))
+                frame["Speed"] = np.round(speed)
+                frame["nGear"] = np.digitize(speed, [90, 125, 160, 195, 230, 265, 295]) + 1
+                frame["Throttle"] = np.where(accel > 1, 100.0, np.where(accel < -8, 0.0, 60.0))
+                frame["Brake"] = accel < -8
+                frame["DRS"] = np.where(speed > 290, 12, 0)
+                frame["Source"] = "car"
+            else:
+                frame["Status"] = "OnTrack"
+                frame["X"] = np.interp(distance, track["distance"], track["x"]) * 10
+                frame["Y"] = np.interp(distance, track["distance"], track["y"]) * 10
+                frame["Z"] = 0.0
+                frame["Source"] = "pos"
+            data[number] = frame
+
+        best = np.minimum.accumulate(np.where(push, lap_times, np.inf))
+        personal_best = push & (lap_times <= best)
+        sectors = lap_times[:, None] * np.array([0.31, 0.37, 0.32])
+        for i in range(n_laps):
+            laps_rows.append({
+                "Time": lap_end[i], "Driver": abb, "DriverNumber": number,
+                "LapTime": lap_times[i], "LapNumber": float(i + 1), "Stint": float(stint[i]),
+                "PitOutTime": lap_start[i] if (i > 0 and pit_in[i - 1]) else np.nan,
+                "PitInTime": lap_end[i] if pit_in[i] else np.nan,
+                "Sector1Time": sectors[i, 0], "Sector2Time": sectors[i, 1], "Sector3Time": sectors[i, 2],
+                "Sector1SessionTime": lap_start[i] + sectors[i, 0],
+                "Sector2SessionTime": lap_start[i] + sectors[i, :2].sum(),
+                "Sector3SessionTime": lap_end[i],
+                "SpeedST": track["speed"].max() / factor[i] * 3.6,
+                "IsPersonalBest": bool(personal_best[i]), "Compound": compound[i],
+                "TyreLife": float(tyre_life[i]), "FreshTyre": True, "Team": team,
+                "LapStartTime": lap_start[i], "TrackStatus": "1",
+                "Deleted": False, "DeletedReason": "", "FastF1Generated": False, "IsAccurate": bool(push[i]),
+            })
+
+    laps = pd.DataFrame(laps_rows)
+    for column in ["Time", "LapTime", "PitOutTime", "PitInTime", "Sector1Time", "Sector2Time",
+                   "Sector3Time", "Sector1SessionTime", "Sector2SessionTime", "Sector3SessionTime", "LapStartTime"]:
+        laps[column] = pd.to_timedelta(laps[column], unit="s")
+    laps["LapStartDate"] = t0_date + laps["LapStartTime"]
+
+    if is_race:
+        # Running order at the end of every lap
+        laps["Position"] = laps.groupby("LapNumber")["Time"].rank(method="first")
+    else:
+        laps["Position"] = np.nan
+
+    results = _results(laps, grid, is_race, n_laps)
+    weather_times = np.arange(0, SESSION_START + laps["Time"].max().total_seconds(), 60.0)
+
+    return {
+        "year": int(year),
+        "event": fields,
+        "session_name": session_name,
+        "session_info": {"Meeting": {"Name": fields["EventName"], "Circuit": {"Key": 0, "ShortName": fields["Location"]}},
+                         "Name": session_name},
+        "session_status": pd.DataFrame({"Time": pd.to_timedelta([SESSION_START, laps["Time"].max().total_seconds()], unit="s"),
+                                        "Status": ["Started", "Finished"]}),
+        "track_status": pd.DataFrame({"Time": [pd.Timedelta(0)], "Status": ["1"], "Message": ["AllClear"]}),
+        "total_laps": n_laps if is_race else None,
+        "t0_date": t0_date,
+        "session_start_time": pd.Timedelta(seconds=SESSION_START),
+        "weather_data": pd.DataFrame({
+            "Time": pd.to_timedelta(weather_times, unit="s"),
+            "AirTemp": 24 + rng.normal(0, 0.3, len(weather_times)), "Humidity": 45.0, "Pressure": 1010.0,
+            "Rainfall": False, "TrackTemp": 38 + rng.normal(0, 0.5, len(weather_times)),
+            "WindDirection": 180, "WindSpeed": 1.5,
+        }),
+        "race_control_messages": pd.DataFrame(columns=["Time", "Category", "Message", "Status", "Flag",
+                                                       "Scope", "Sector", "RacingNumber", "Lap"]),
+        "laps": laps,
+        "results": results,
+        "car_data": car_data,
+        "pos_data": pos_data,
+        "circuit": {
+            "corners": _corners(track),
+            "marshal_lights": pd.DataFrame(columns=["X", "Y", "Number", "Letter", "Angle", "Distance"]),
+            "marshal_sectors": pd.DataFrame(columns=["X", "Y", "Number", "Letter", "Angle", "Distance"]),
+            "rotation": 0.0,
+        },
+    }
+
+
+def _results(laps, grid, is_race, n_laps) -> pd.DataFrame:
+    drivers = pd.DataFrame(grid, columns=["Abbreviation", "DriverNumber", "TeamName", "TeamColor"])
+    best = laps[laps["IsPersonalBest"]].groupby("Driver")["LapTime"].min()
+    drivers["BestLap"] = drivers["Abbreviation"].map(best)
+    drivers["GridPosition"] = drivers["BestLap"].rank(method="first")
+
+    if is_race:
+        finish = laps.groupby("Driver")["Time"].max()
+        drivers["Finish"] = drivers["Abbreviation"].map(finish)
+        drivers = drivers.sort_values("Finish").reset_index(drop=True)
+        drivers["Time"] = drivers["Finish"] - pd.Timedelta(seconds=SESSION_START)
+        drivers.loc[1:, "Time"] = drivers["Finish"].iloc[1:] - drivers["Finish"].iloc[0]
+        drivers["Points"] = [RACE_POINTS[i] if i < len(RACE_POINTS) else 0 for i in range(len(drivers))]
+        drivers["Status"] = "Finished"
+        drivers["Laps"] = float(n_laps)
+        drivers[["Q1", "Q2", "Q3"]] = pd.NaT
+    else:
+        drivers = drivers.sort_values("BestLap").reset_index(drop=True)
+        drivers["Time"] = pd.NaT
+        drivers["Points"] = np.nan
+        drivers["Status"] = ""
+        drivers["Laps"] = laps.groupby("Driver").size().reindex(drivers["Abbreviation"]).to_numpy(dtype=float)
+        drivers["Q1"] = drivers["BestLap"]
+        drivers["Q2"] = drivers["BestLap"].where(drivers.index < 15)
+        drivers["Q3"] = drivers["BestLap"].where(drivers.index < 10)
+
+    position = np.arange(1, len(drivers) + 1, dtype=float)
+    first_names = drivers["Abbreviation"].str.title()
+    return pd.DataFrame({
+        "DriverNumber": drivers["DriverNumber"], "BroadcastName": "X " + drivers["Abbreviation"],
+        "Abbreviation": drivers["Abbreviation"], "DriverId": drivers["Abbreviation"].str.lower(),
+        "TeamName": drivers["TeamName"], "TeamColor": drivers["TeamColor"],
+        "TeamId": drivers["TeamName"].map(_slug), "FirstName": first_names,
+        "LastName": drivers["Abbreviation"], "FullName": first_names + " " + drivers["Abbreviation"],
+        "HeadshotUrl": "", "CountryCode": "", "Position": position, "ClassifiedPosition": position.astype(int).astype(str),
+        "GridPosition": drivers["GridPosition"], "Q1": drivers["Q1"], "Q2": drivers["Q2"], "Q3": drivers["Q3"],
+        "Time": drivers["Time"], "Status": drivers["Status"], "Points": drivers["Points"], "Laps": drivers["Laps"],
+    })
+
+
+# -------------------- Fixtures --------------------
+
+def record_fixture(session, directory: str, drivers=None, max_laps: int = None) -> str:
+    """Trim a loaded FastF1 session into a small fixture file in ``directory``.
+
+    Keeps ``drivers`` (abbreviations, default all), their first ``max_laps``
+    laps (default all) and only the car and position data inside those laps.
+    Returns the fixture's path.
+    """
+    laps = pd.DataFrame(session.laps)
+    results = pd.DataFrame(session.results)
+    if drivers is not None:
+        laps = laps[laps["Driver"].isin(drivers)]
+        results = results[results["Abbreviation"].isin(drivers)]
+    if max_laps is not None:
+        laps = laps[laps["LapNumber"] <= max_laps]
+
+    def trim(telemetry):
+        kept = {}
+        for number, driver_laps in laps.groupby("DriverNumber"):
+            data = telemetry.get(str(number))
+            if data is None:
+                continue
+            start, end = driver_laps["LapStartTime"].min(), driver_laps["Time"].max()
+            # One extra second either side so lap edges can be interpolated
+            window = data["SessionTime"].between(start - pd.Timedelta(seconds=1), end + pd.Timedelta(seconds=1))
+            kept[str(number)] = pd.DataFrame(data[window])
+        return kept
+
+    def optional(name):
+        try:
+            return getattr(session, name)
+        except Exception:
+            return None
+
+    circuit = None
+    try:
+        info = session.get_circuit_info()
+        if info is not None:
+            circuit = {"corners": info.corners, "marshal_lights": info.marshal_lights,
+                       "marshal_sectors": info.marshal_sectors, "rotation": info.rotation}
+    except Exception:
+        pass
+
+    event = session.event
+    parts = {
+        "year": int(event.year),
+        "event": {name: event[name] for name in event.index},
+        "session_name": session.name,
+        "session_info": optional("session_info") or {},
+        "session_status": optional("session_status"),
+        "track_status": optional("track_status"),
+        "total_laps": optional("total_laps"),
+        "t0_date": optional("t0_date"),
+        "session_start_time": optional("session_start_time"),
+        "weather_data": optional("weather_data"),
+        "race_control_messages": optional("race_control_messages"),
+        "laps": laps,
+        "results": results,
+        "car_data": trim(optional("car_data") or {}),
+        "pos_data": trim(optional("pos_data") or {}),
+        "circuit": circuit,
+    }
+
+    os.makedirs(directory, exist_ok=True)
+    filename = f"{parts['year']}_{_slug(event['EventName'])}_{_slug(session.name)}.pkl.gz"
+    path = os.path.join(directory, filename)
+    with gzip.open(path, "wb") as f:
+        pickle.dump(parts, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    index_path = os.path.join(directory, FIXTURE_INDEX)
+    index = FixtureProvider(directory)._index()
+    index[filename] = {
+        "year": parts["year"], "event": str(event["EventName"]), "location": str(event["Location"]),
+        "country": str(event["Country"]), "round": int(event["RoundNumber"]), "session": session.name,
+        "event_fields": {name: (value.isoformat() if hasattr(value, "isoformat") else value)
+                         for name, value in parts["event"].items()},
+    }
+    with open(index_path, "w") as f:
+        json.dump(index, f, indent=2, default=str)
+    return path
@@ -1,8 +1,15 @@
-import fastf1
+import weakref
+import fastf1.plotting
 import pandas as pd
 import numpy as np
 from plotly.offline import plot
 import plotly.graph_objects as go
+import plotly.io as pio
+from visualizations.data_requirements import uses, load_for
+from visualizations.fuel import fuel_model_for, corrected_lap_times
+from visualizations.compression import compress_variants
+from visualizations.metrics import count_cache
+from visualizations.singleflight import SingleFlight
 
 
 # -------------------- Constants --------------------
@@ -15,6 +22,15 @@ COMPOUND_COLORS = {
     "WET": "#1E90FF"
 }
 
+# Figures of the race dashboard, in page order
+DASHBOARD_FIGURES = ["positions", "lap_times", "team_pace"]
+
+# Serialised dashboard figures, dropped together with their session
+_dashboard_json = weakref.WeakKeyDictionary()
+
+# Parallel requests for one race's figures build them once
+_dashboard_builds = SingleFlight()
+
 
 # -------------------- Utilities --------------------
 
@@ -24,22 +40,11 @@ def _coerce_secs(td_series: pd.Series) -> pd.Series:
     return s.replace([np.inf, -np.inf], np.nan)
 
 
-def fuel_correct_lap(
-    laptime_s: float,
-    lap_number: int,
-    total_laps: int,
-    fuel_effect_per_10kg: float = 0.30,
-    fuel_per_lap_kg: float = 1.85
-) -> float:
-    fuel_remaining = (total_laps - lap_number) * fuel_per_lap_kg
-    return laptime_s - (fuel_remaining / 10.0) * fuel_effect_per_10kg
-
-
 # -------------------- Main Dashboard --------------------
 
-def combined_plotly_race_dashboard(year: int, grand_prix: str) -> str:
-    session = fastf1.get_session(year, grand_prix, "R")
-    session.load(telemetry=False, weather=False)
+@uses("laps", "results")
+def race_dashboard_figures(year: int, grand_prix: str) -> dict:
+    session = load_for(race_dashboard_figures, year, grand_prix, "R")
 
     # ==================================================
     # 1) Position change chart
@@ -172,16 +177,7 @@ def combined_plotly_race_dashboard(year: int, grand_prix: str) -> str:
         laps.loc[:, "LapTime_s"] = _coerce_secs(laps["LapTime"])
         laps = laps.dropna(subset=["LapTime_s"])
 
-        total_laps = int(laps["LapNumber"].max())
-
-        laps.loc[:, "CorrectedLap_s"] = [
-            fuel_correct_lap(
-                row.LapTime_s,
-                int(row.LapNumber),
-                total_laps
-            )
-            for row in laps.itertuples()
-        ]
+        laps.loc[:, "CorrectedLap_s"] = corrected_lap_times(laps, fuel_model_for(session))
 
         team_order = (
             laps.groupby("Team")["CorrectedLap_s"]
@@ -222,33 +218,69 @@ def combined_plotly_race_dashboard(year: int, grand_prix: str) -> str:
             annotations=[dict(text=str(e), x=0.5, y=0.5, showarrow=False)]
         )
 
+    return {"positions": pos_fig, "lap_times": lap_fig, "team_pace": team_fig}
+
+
+@uses("laps", "results")
+def combined_plotly_race_dashboard(year: int, grand_prix: str) -> str:
+    figures = race_dashboard_figures(year, grand_prix)
+
     # ==================================================
     # Render HTML
     # ==================================================
 
     return f"""
     <div class="race-dashboard">
-        {plot(pos_fig, output_type="div", include_plotlyjs="cdn")}
-        {plot(lap_fig, output_type="div", include_plotlyjs=False)}
-        {plot(team_fig, output_type="div", include_plotlyjs=False)}
+        {plot(figures["positions"], output_type="div", include_plotlyjs="cdn")}
+        {plot(figures["lap_times"], output_type="div", include_plotlyjs=False)}
+        {plot(figures["team_pace"], output_type="div", include_plotlyjs=False)}
     </div>
     """
 
 
+@uses("laps", "results")
+def race_dashboard_json(year: int, grand_prix: str, name: str) -> dict:
+    """One dashboard figure as Plotly JSON, ``{content-encoding: body}``.
+
+    All three figures are built and serialised once per session (orjson
+    when it is installed, which handles numpy arrays natively) and kept
+    compressed, so later requests only pick a variant.
+    """
+    if name not in DASHBOARD_FIGURES:
+        raise KeyError(name)
+
+    session = load_for(race_dashboard_json, year, grand_prix, "R")
+    figures = _dashboard_json.get(session)
+    count_cache("dashboard_json", figures is not None)
+    if figures is None:
+        def build():
+            return {
+                figure_name: compress_variants(pio.to_json(fig, validate=False).encode("utf-8"))
+                for figure_name, fig in race_dashboard_figures(year, grand_prix).items()
+            }
+        figures, _ = _dashboard_builds.do(id(session), build)
+        _dashboard_json[session] = figures
+    return figures[name]
+
+
 # -------------------- Driver vs Driver --------------------
 
+@uses("laps")
 def driver_vs_driver_pace_plot(
         year: int,
         grand_prix: str,
         driver_A: str,
         driver_B: str,
-        fuel_load_start: float = 105.0,
-        fuel_per_lap: float = 1.6,
-        delta_per_kg: float = 0.035
+        fuel_load_start: float = None,
+        fuel_per_lap: float = None,
+        delta_per_kg: float = None
     ) -> dict:
+    """Fuel-corrected pace of two drivers; the fuel constants default to the race's fitted model"""
 
-    session = fastf1.get_session(year, grand_prix, "R")
-    session.load()
+    session = load_for(driver_vs_driver_pace_plot, year, grand_prix, "R")
+    fuel_model = fuel_model_for(session).with_overrides(
+        sec_per_kg=delta_per_kg, start_fuel_kg=fuel_load_start, fuel_per_lap_kg=fuel_per_lap
+    )
 
     compound_colors = {
         "SOFT": "#FF4D4D",
@@ -273,12 +305,7 @@ def driver_vs_driver_pace_plot(
         lap_times = laps["LapTime"].dt.total_seconds().to_numpy()
         compounds = laps["Compound"].fillna("UNKNOWN").to_numpy()
 
-        fuel_remaining = np.clip(
-            fuel_load_start - lap_numbers * fuel_per_lap, 0, None
-        )
-
-        fuel_correction = fuel_remaining * delta_per_kg
-        corrected = lap_times - fuel_correction
+        corrected = corrected_lap_times(laps, fuel_model)
 
         for comp in np.unique(compounds):
 
@@ -0,0 +1,182 @@
+"""In-memory index of the season schedules.
+
+``find_track_image`` ran on every results page and fetched the season's
+schedule each time to filter it on EventName/Country, and the home page
+fetched it twice per season it looked at. ``schedule_index(year)`` builds
+one ``ScheduleIndex`` per season instead and keeps it:
+
+- event lookups by name, country, location or official name go through a
+  dict of normalised names (case, accents and punctuation don't matter),
+- "what's next" questions bisect sorted arrays of race and session start
+  times (UTC).
+
+The index of a season that is still running is rebuilt after SCHEDULE_TTL
+seconds so calendar changes show up; finished seasons are kept for good.
+Indexes are per session provider, so the synthetic and fixture providers
+get their own schedules.
+"""
+import bisect
+import datetime
+import os
+import re
+import threading
+import time
+import unicodedata
+import weakref
+
+from visualizations.metrics import count_cache
+from visualizations.sessions import get_event_schedule, get_session_provider
+from visualizations.singleflight import SingleFlight
+
+# Seconds before the index of a running season is rebuilt (override with F1_SCHEDULE_TTL)
+SCHEDULE_TTL = float(os.environ.get("F1_SCHEDULE_TTL", 6 * 3600))
+
+# Schedule columns an event can be looked up by, strongest first: a name
+# another event has as its country (e.g. two races in Italy) never wins
+LOOKUP_COLUMNS = ("EventName", "OfficialEventName", "Location", "Country")
+
+_lock = threading.Lock()
+# provider -> {year: ScheduleIndex}
+_indexes = weakref.WeakKeyDictionary()
+_builds = SingleFlight()
+
+
+def normalise_name(name) -> str:
+    """Lookup key of an event, country or location name"""
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+def _utc(value):
+    """Timezone aware UTC datetime, None for missing values"""
+    if value is None or value != value:  # missing or NaT
+        return None
+    value = value.to_pydatetime() if hasattr(value, "to_pydatetime") else value
+    if not isinstance(value, datetime.datetime):
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc)
+
+
+class ScheduleIndex:
+    """Events of one season, by name and by start time"""
+
+    def __init__(self, year: int, schedule):
+        self.year = year
+        self.built = time.monotonic()
+        self.events = []
+        self._by_name = {}
+        # (race start, position in events), and every session as (start, position, name)
+        self._race_starts = []
+        self._session_starts = []
+        # column -> normalised name, per event
+        names = []
+
+        for _, row in schedule.iterrows():
+            position = len(self.events)
+            event = {
+                "round": int(row["RoundNumber"]),
+                "name": row["EventName"],
+                "country": row["Country"],
+                "location": row["Location"],
+                "format": row.get("EventFormat"),
+                "sessions": [],
+            }
+            for i in range(1, 6):
+                session, start = row.get(f"Session{i}"), _utc(row.get(f"Session{i}DateUtc"))
+                if not isinstance(session, str) or not session or start is None:
+                    continue
+                event["sessions"].append((session, start))
+                self._session_starts.append((start, position, session))
+
+            # Race start, or the last day of a test; the event date if no session has a time
+            event["start"] = event["sessions"][-1][1] if event["sessions"] else _utc(row.get("EventDate"))
+            if event["start"] is not None:
+                self._race_starts.append((event["start"], position))
+            self.events.append(event)
+
+            names.append({
+                column: normalise_name(row.get(column)) for column in LOOKUP_COLUMNS
+                if isinstance(row.get(column), str)
+            })
+
+        # Strongest column first, then schedule order, like the old EventName-or-Country filter
+        for column in LOOKUP_COLUMNS:
+            for event, keys in zip(self.events, names):
+                if keys.get(column):
+                    self._by_name.setdefault(keys[column], event)
+
+        self._race_starts.sort(key=lambda entry: entry[0])
+        self._session_starts.sort(key=lambda entry: entry[0])
+        self._race_times = [start for start, _ in self._race_starts]
+        self._session_times = [start for start, _, _ in self._session_starts]
+
+    def find(self, name):
+        """The event called ``name`` (event name, country, location...), or None"""
+        return self._by_name.get(normalise_name(name))
+
+    def next_event(self, now=None):
+        """The first event whose race (or last session) starts after ``now``"""
+        now = _utc(now) or datetime.datetime.now(datetime.timezone.utc)
+        i = bisect.bisect_right(self._race_times, now)
+        return self.events[self._race_starts[i][1]] if i < len(self._race_starts) else None
+
+    def next_session(self, now=None):
+        """``(event, session name, start)`` of the first session after ``now``, or None"""
+        now = _utc(now) or datetime.datetime.now(datetime.timezone.utc)
+        i = bisect.bisect_right(self._session_times, now)
+        if i == len(self._session_starts):
+            return None
+        start, position, session = self._session_starts[i]
+        return self.events[position], session, start
+
+    def finished(self, now=None) -> bool:
+        """True once the season's last session is over"""
+        now = _utc(now) or datetime.datetime.now(datetime.timezone.utc)
+        last = max(self._race_times[-1:] + self._session_times[-1:], default=None)
+        return last is not None and last < now
+
+    def expired(self) -> bool:
+        return not self.finished() and time.monotonic() - self.built > SCHEDULE_TTL
+
+
+def schedule_index(year: int) -> ScheduleIndex:
+    """The season's index, built on first use and after SCHEDULE_TTL"""
+    year = int(year)
+    provider = get_session_provider()
+    with _lock:
+        index = _indexes.get(provider, {}).get(year)
+    if index is not None and not index.expired():
+        count_cache("schedule", True)
+        return index
+
+    count_cache("schedule", False)
+
+    def build():
+        index = ScheduleIndex(year, get_event_schedule(year))
+        with _lock:
+            _indexes.setdefault(provider, {})[year] = index
+        return index
+
+    index, _ = _builds.do((id(provider), year), build)
+    return index
+
+
+def find_event(year: int, name):
+    """The season's event matching ``name``, or None"""
+    return schedule_index(year).find(name)
+
+
+def next_event(years, now=None):
+    """``(year, event)`` of the first upcoming event in ``years``, or None"""
+    for year in years:
+        event = schedule_index(year).next_event(now)
+        if event is not None:
+            return year, event
+    return None
+
+
+def clear_schedule_index():
+    with _lock:
+        _indexes.clear()
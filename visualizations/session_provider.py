@@ -0,0 +1,50 @@
+"""The session provider interface and the default FastF1 provider.
+
+Kept apart from providers.py, which holds the offline providers: those
+need pandas, numpy and fastf1's internals at import time, while picking
+the default provider should cost nothing. ``provider_from_env`` only
+imports providers.py when F1_SESSION_PROVIDER names an offline provider.
+"""
+import os
+
+from visualizations.fastf1_cache import enable_fastf1_cache
+
+
+class SessionProvider:
+    """Interface: ``get_session`` returns an unloaded fastf1 Session,
+    ``get_event_schedule`` the season's fastf1 EventSchedule"""
+
+    def get_session(self, year: int, gp, session_type: str):
+        raise NotImplementedError
+
+    def get_event_schedule(self, year: int, include_testing: bool = True):
+        raise NotImplementedError
+
+
+class FastF1Provider(SessionProvider):
+
+    def get_session(self, year, gp, session_type):
+        import fastf1
+
+        enable_fastf1_cache()
+        return fastf1.get_session(year, gp, session_type)
+
+    def get_event_schedule(self, year, include_testing=True):
+        import fastf1
+
+        enable_fastf1_cache()
+        return fastf1.get_event_schedule(year, include_testing=include_testing)
+
+
+def provider_from_env(value: str = None) -> SessionProvider:
+    """Provider named by F1_SESSION_PROVIDER (fastf1, synthetic, fixtures:<dir>)"""
+    value = value if value is not None else os.environ.get("F1_SESSION_PROVIDER", "fastf1")
+    if value == "fastf1":
+        return FastF1Provider()
+    if value == "synthetic":
+        from visualizations.providers import SyntheticProvider
+        return SyntheticProvider()
+    if value.startswith("fixtures:"):
+        from visualizations.providers import FixtureProvider
+        return FixtureProvider(value.split(":", 1)[1])
+    raise ValueError(f"Unknown session provider: {value}")
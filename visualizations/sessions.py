@@ -0,0 +1,318 @@
+"""Process-wide cache of loaded FastF1 sessions.
+
+Every view used to call ``fastf1.get_session(...).load()`` on its own, so a
+single race page parsed the same session four or five times. Views now call
+``load_session`` instead, which hands back one shared session per
+(year, grand prix, session type) for the lifetime of the process.
+
+Each cached session sits behind a ``SessionHandle`` that remembers which parts
+(laps, results, telemetry, weather, messages) have been loaded so far. When a
+view asks for more than is in memory only the missing parts are fetched, e.g.
+a laps-only race session gains telemetry without re-parsing its laps.
+
+Loads go through a single-flight layer: threads that ask for a session while
+another thread is already loading it wait for that load and share it.
+
+Sessions are created by the active provider (see providers.py), which is the
+FastF1 API unless a synthetic or fixture provider has been set.
+"""
+import datetime
+import os
+import threading
+from collections import OrderedDict
+
+from visualizations.metrics import span
+from visualizations.singleflight import SingleFlight
+
+# Memory budget for loaded sessions (override with F1_SESSION_CACHE_MB)
+SESSION_CACHE_MAX_BYTES = int(os.environ.get("F1_SESSION_CACHE_MB", "2048")) * 1024 * 1024
+
+# Keyword arguments understood by fastf1's Session.load()
+LOAD_FLAGS = ("laps", "telemetry", "weather", "messages")
+
+# Parts a handle keeps track of. Results are part of every load.
+SESSION_PARTS = ("results",) + LOAD_FLAGS
+
+# Time after a session from which its timing data is treated as final
+HISTORICAL_AFTER = datetime.timedelta(days=3)
+
+_lock = threading.Lock()
+_max_bytes = SESSION_CACHE_MAX_BYTES
+
+# (year, event name, session name) -> SessionHandle, least recently used first
+_handles = OrderedDict()
+# Raw user input -> resolved (year, event name, session name)
+_aliases = {}
+
+# One in-progress load per session, shared by every thread that needs it
+_loads = SingleFlight()
+_stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+# Creates the session objects (override with F1_SESSION_PROVIDER). Made on
+# first use, so importing this module doesn't import fastf1.
+_provider = None
+
+
+# -------------------- Utilities --------------------
+
+def _raw_key(year, gp, session_type):
+    return (int(year), str(gp).strip().lower(), str(session_type).strip().upper())
+
+
+def _requested_parts(**flags) -> frozenset:
+    """Translate load() keyword arguments into the set of parts they load"""
+    unknown = set(flags) - set(LOAD_FLAGS)
+    if unknown:
+        raise TypeError(f"Unknown load flags: {sorted(unknown)}")
+    parts = {name for name in LOAD_FLAGS if flags.get(name, True)}
+    return frozenset(parts | {"results"})
+
+
+def _frame_nbytes(frame) -> int:
+    if frame is None:
+        return 0
+    try:
+        return int(frame.memory_usage(deep=True).sum())
+    except Exception:
+        return 0
+
+
+def session_nbytes(session) -> int:
+    """Rough in-memory size of everything a session has loaded"""
+    # Private attributes are used because the public properties raise
+    # DataNotLoadedError for parts that were never requested
+    total = _frame_nbytes(getattr(session, "results", None))
+    for attr in ("_laps", "_weather_data", "_race_control_messages"):
+        total += _frame_nbytes(getattr(session, attr, None))
+    for attr in ("_car_data", "_pos_data"):
+        for tel in (getattr(session, attr, None) or {}).values():
+            total += _frame_nbytes(tel)
+    return total
+
+
+# -------------------- Session handle --------------------
+
+class SessionHandle:
+    """A FastF1 session plus the record of which parts are already loaded"""
+
+    def __init__(self, key, session):
+        self.key = key
+        self.session = session
+        self.loaded = frozenset()
+        self.nbytes = 0
+
+    def missing(self, parts) -> frozenset:
+        return frozenset(parts) - self.loaded
+
+    def ensure(self, parts):
+        """Load whatever of ``parts`` is not in memory yet and return the session"""
+        parts = frozenset(parts) | {"results"}
+        if not self.missing(parts):
+            _count("hits")
+            return self.session
+
+        _count("misses")
+        while True:
+            _, shared = _loads.do(self.key, lambda: self._load(parts))
+            if not shared:
+                return self.session
+            # Another thread's load finished; it may not have covered our parts
+            if not self.missing(parts):
+                _count("coalesced")
+                return self.session
+
+    def _load(self, parts):
+        missing = self.missing(parts)
+        if not missing:
+            return
+        with span("session_load"):
+            if not self.loaded:
+                self._first_load(parts)
+            else:
+                self._upgrade(missing)
+        self.loaded = self.loaded | parts
+        self.nbytes = session_nbytes(self.session)
+
+    def _first_load(self, parts):
+        self.session.load(**{name: name in parts for name in LOAD_FLAGS})
+
+    def _upgrade(self, missing):
+        """Fetch only the missing parts, mirroring the steps of Session.load()"""
+        session = self.session
+
+        if not session.f1_api_support:
+            # Nothing beyond results exists for these sessions
+            return
+
+        try:
+            if "laps" in missing:
+                session._load_session_status_data()
+                session._load_total_lap_count()
+                session._load_track_status_data()
+                session._load_laps_data()
+                session._add_first_lap_time_from_ergast()
+                session._fix_missing_laps_retired_on_track()
+                if "telemetry" in self.loaded:
+                    # Normally added by the telemetry loader
+                    session._laps["LapStartDate"] = session._laps["LapStartTime"] + session.t0_date
+
+            if "telemetry" in missing:
+                session._load_telemetry()
+
+            if "weather" in missing:
+                session._load_weather_data()
+
+            if "messages" in missing:
+                session._load_race_control_messages()
+
+        except AttributeError:
+            # The private loaders moved in this FastF1 version, do a full load
+            session.load(**{name: name in self.loaded | missing for name in LOAD_FLAGS})
+            return
+
+        if missing & {"laps", "messages"}:
+            session._set_laps_deleted_from_rcm()
+            session._calculate_quali_like_session_results()
+            session._calculate_race_like_session_results()
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def _evict():
+    """Drop least recently used sessions until the cache fits its budget"""
+    total = sum(handle.nbytes for handle in _handles.values())
+    # Always keep the most recent entry, even if it alone exceeds the budget
+    while total > _max_bytes and len(_handles) > 1:
+        _, handle = _handles.popitem(last=False)
+        total -= handle.nbytes
+
+
+def _handle_for(year, gp, session_type) -> SessionHandle:
+    raw = _raw_key(year, gp, session_type)
+
+    with _lock:
+        canonical = _aliases.get(raw)
+        if canonical in _handles:
+            _handles.move_to_end(canonical)
+            return _handles[canonical]
+
+    session = get_session_provider().get_session(year, gp, session_type)
+    canonical = (int(year), session.event["EventName"], session.name)
+
+    with _lock:
+        _aliases[raw] = canonical
+        if canonical not in _handles:
+            _handles[canonical] = SessionHandle(canonical, session)
+        _handles.move_to_end(canonical)
+        return _handles[canonical]
+
+
+# -------------------- Public API --------------------
+
+def get_session_handle(year: int, gp: str, session_type: str) -> SessionHandle:
+    """Cached handle for a session, without loading anything"""
+    return _handle_for(year, gp, session_type)
+
+
+def session_is_historical(year: int, gp: str, session_type: str) -> bool:
+    """True once a session is old enough that its data will not change any more"""
+    date = _handle_for(year, gp, session_type).session.date
+    if date is None or date != date:  # missing or NaT
+        return False
+    date = date.to_pydatetime() if hasattr(date, "to_pydatetime") else date
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return date + HISTORICAL_AFTER < datetime.datetime.now(datetime.timezone.utc)
+
+
+def load_session(year: int, gp: str, session_type: str, **flags):
+    """Return a loaded FastF1 session, parsing each part at most once per process.
+
+    ``flags`` are the same keyword arguments as ``Session.load()`` and default
+    to True like they do there. Parts loaded earlier by other views are kept,
+    so the returned session may hold more data than was asked for.
+    """
+    handle = _handle_for(year, gp, session_type)
+    had = handle.nbytes
+    session = handle.ensure(_requested_parts(**flags))
+
+    if handle.nbytes != had:
+        with _lock:
+            _evict()
+
+    return session
+
+
+def set_session_provider(provider):
+    """Create sessions with ``provider`` from now on, returning the old one.
+
+    The session cache is cleared, so no session from the old provider is
+    handed out afterwards.
+    """
+    global _provider
+    previous, _provider = _provider, provider
+    clear_session_cache()
+    return previous
+
+
+def get_session_provider():
+    global _provider
+    if _provider is None:
+        from visualizations.session_provider import provider_from_env
+        with _lock:
+            if _provider is None:
+                _provider = provider_from_env()
+    return _provider
+
+
+def get_event_schedule(year: int, include_testing: bool = True):
+    """The season's event schedule, from the same provider as the sessions"""
+    return get_session_provider().get_event_schedule(year, include_testing=include_testing)
+
+
+def configure_session_cache(max_bytes: int = None):
+    """Change the memory budget of the session cache"""
+    global _max_bytes
+    with _lock:
+        if max_bytes is not None:
+            _max_bytes = int(max_bytes)
+        _evict()
+
+
+def clear_session_cache():
+    with _lock:
+        _handles.clear()
+        _aliases.clear()
+        for name in _stats:
+            _stats[name] = 0
+    _loads.reset_stats()
+
+
+def session_cache_info() -> dict:
+    with _lock:
+        return {
+            "sessions": len(_handles),
+            "bytes": sum(handle.nbytes for handle in _handles.values()),
+            "max_bytes": _max_bytes,
+            "loaded": {
+                f"{year} {event} {name}": sorted(handle.loaded)
+                for (year, event, name), handle in _handles.items()
+            },
+        }
+
+
+def session_load_stats() -> dict:
+    """Counters for the session cache and the single-flight load layer.
+
+    ``coalesced`` counts requests that waited on another thread's load instead
+    of starting their own, i.e. the number of loads saved.
+    """
+    with _lock:
+        stats = dict(_stats)
+    stats["loads"] = _loads.executions
+    stats["in_flight"] = _loads.in_flight()
+    stats["waiting"] = _loads.waiting()
+    return stats
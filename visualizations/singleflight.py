@@ -0,0 +1,74 @@
+"""Coalesce concurrent calls for the same key into one execution.
+
+Right after a race dozens of request threads ask for the same cold session at
+once. With ``SingleFlight.do`` the first caller for a key runs the work and
+every caller that arrives while it is running waits for it and shares its
+result (or exception) instead of starting its own copy.
+"""
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        """Run ``fn()`` once for all concurrent callers of ``key``.
+
+        Returns ``(result, shared)`` where ``shared`` is True for callers that
+        waited on another thread's execution instead of running ``fn``.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, False
+
+    def reset_stats(self):
+        with self._lock:
+            self.executions = 0
+            self.shared = 0
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def waiting(self) -> int:
+        with self._lock:
+            return sum(call.waiters for call in self._calls.values())
@@ -0,0 +1,141 @@
+"""Championship standings for the home page, kept off the request path.
+
+The home page used to build an Ergast client and wait on the API for both
+standings tables on every request. Now a daemon thread (started by the
+first request that asks for a table) fetches every registered table and
+refreshes it every STANDINGS_TTL seconds, and ``standings_html`` only ever
+reads memory:
+
+- fresh tables are served as they are,
+- tables older than the TTL are still served (stale-while-revalidate) and
+  the refresher is woken to fetch them again,
+- before the first fetch has finished the page gets a placeholder.
+
+A failed fetch keeps the last good table and is retried after
+RETRY_AFTER seconds. A table's HTML is only rendered again when its data
+changed.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from visualizations.metrics import count_cache, span
+
+# Seconds a fetched table is fresh for (override with F1_STANDINGS_TTL)
+STANDINGS_TTL = float(os.environ.get("F1_STANDINGS_TTL", 15 * 60))
+
+# Seconds before a failed fetch is tried again
+RETRY_AFTER = 60.0
+
+# Shown until the first fetch of a table has finished
+PLACEHOLDER = '<p class="championship-table-loading">Standings are loading&hellip;</p>'
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# Set to make the refresher look at the tables now
+_wake = threading.Event()
+_thread = None
+
+# name -> (fetch, render)
+_tables = {}
+# name -> {"html", "digest", "fetched", "attempted", "error"}
+_entries = {}
+
+
+def register_table(name: str, fetch, render):
+    """Keep ``render(fetch())`` for the home page; ``fetch`` returns a DataFrame"""
+    with _lock:
+        _tables[name] = (fetch, render)
+
+
+# -------------------- Refreshing --------------------
+
+def refresh_table(name: str) -> bool:
+    """Fetch one table now; True if it worked"""
+    fetch, render = _tables[name]
+    with _lock:
+        entry = _entries.setdefault(name, {"html": None, "digest": None, "fetched": None,
+                                           "attempted": None, "error": None})
+        entry["attempted"] = time.monotonic()
+    try:
+        with span(f"standings.{name}"):
+            df = fetch()
+            digest = hashlib.sha1(df.to_json().encode("utf-8")).hexdigest()
+            # Same standings as last time, e.g. no race in between: keep the HTML
+            html = entry["html"] if digest == entry["digest"] else render(df)
+    except Exception as e:
+        log.warning("Fetching the %s standings failed: %s", name, e)
+        with _lock:
+            entry["error"] = f"{type(e).__name__}: {e}"
+        return False
+
+    with _lock:
+        entry.update(html=html, digest=digest, fetched=time.monotonic(), error=None)
+    return True
+
+
+def _due_in(name: str, now: float) -> float:
+    """Seconds until a table should be fetched again, 0 or less if it is due"""
+    entry = _entries.get(name)
+    if entry is None or entry["attempted"] is None:
+        return 0.0
+    if entry["error"] is not None:
+        return entry["attempted"] + RETRY_AFTER - now
+    return entry["fetched"] + STANDINGS_TTL - now
+
+
+def _run():
+    while True:
+        _wake.clear()
+        for name in list(_tables):
+            if _due_in(name, time.monotonic()) <= 0:
+                refresh_table(name)
+
+        now = time.monotonic()
+        with _lock:
+            wait = min((_due_in(name, now) for name in _tables), default=STANDINGS_TTL)
+        _wake.wait(max(wait, 1.0))
+
+
+def start_refresher():
+    """Start the background refresher, once per process"""
+    global _thread
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            return
+        _thread = threading.Thread(target=_run, name="standings-refresher", daemon=True)
+        _thread.start()
+
+
+# -------------------- Public API --------------------
+
+def standings_html(name: str) -> str:
+    """The table's latest HTML, or PLACEHOLDER; never waits on the network"""
+    start_refresher()
+    with _lock:
+        entry = _entries.get(name)
+        html = entry["html"] if entry is not None else None
+        fresh = html is not None and _due_in(name, time.monotonic()) > 0
+    count_cache("standings", fresh)
+    if not fresh:
+        # Missing or stale: serve what there is and have it fetched
+        _wake.set()
+    return html if html is not None else PLACEHOLDER
+
+
+def standings_info() -> dict:
+    """Age and last error of every table, for /stats/standings"""
+    now = time.monotonic()
+    with _lock:
+        return {
+            name: {
+                "ready": entry["html"] is not None,
+                "age_s": round(now - entry["fetched"], 1) if entry["fetched"] is not None else None,
+                "stale": entry["fetched"] is None or now - entry["fetched"] > STANDINGS_TTL,
+                "error": entry["error"],
+            }
+            for name, entry in _entries.items()
+        }
@@ -0,0 +1,206 @@
+import weakref
+
+import numpy as np
+import pandas as pd
+
+
+# -------------------- Constants --------------------
+
+# Spacing of the common distance grid (m), ~5k samples over a typical lap
+DISTANCE_STEP_M = 1.0
+
+# Channels in the comparison matrix. Smooth ones are interpolated, stepped
+# ones (gear, DRS) hold their last value.
+INTERPOLATED_CHANNELS = ["Time", "Speed", "Throttle", "Brake", "RPM"]
+STEPPED_CHANNELS = ["nGear", "DRS"]
+CHANNELS = INTERPOLATED_CHANNELS + STEPPED_CHANNELS
+
+# Comparisons already computed, dropped together with their session
+_comparisons = weakref.WeakKeyDictionary()
+
+
+# -------------------- Comparison --------------------
+
+class LapComparison:
+    """Several laps resampled onto one distance grid.
+
+    ``data`` is a (laps x channels x samples) matrix in CHANNELS order,
+    ``time`` the elapsed lap time (s) of every lap at each grid point.
+    """
+
+    def __init__(self, drivers, distance: np.ndarray, data: np.ndarray):
+        self.drivers = list(drivers)
+        self.distance = distance
+        self.data = data
+
+    def channel(self, name: str) -> np.ndarray:
+        """One channel for every lap, (laps x samples)"""
+        return self.data[:, CHANNELS.index(name)]
+
+    @property
+    def time(self) -> np.ndarray:
+        return self.channel("Time")
+
+    def delta(self, reference) -> np.ndarray:
+        """Cumulative time gap of every lap to ``reference`` (driver or row),
+        positive where the lap is behind"""
+        row = self.drivers.index(reference) if isinstance(reference, str) else reference
+        return self.time - self.time[row]
+
+    def pairwise_delta(self) -> np.ndarray:
+        """Cumulative time gap between every pair of laps, (laps x laps x samples).
+        ``[i, j]`` is how far lap i is behind lap j."""
+        return self.time[:, None, :] - self.time[None, :, :]
+
+    def to_dict(self) -> dict:
+        return {
+            "drivers": self.drivers,
+            "distance": self.distance.tolist(),
+            **{name: self.channel(name).tolist() for name in CHANNELS},
+        }
+
+
+# -------------------- Utilities --------------------
+
+def lap_samples(lap):
+    """Car data of one lap as (distance, {channel: samples}), distance strictly increasing"""
+    tel = lap.get_car_data().add_distance()
+    distance = tel["Distance"].to_numpy(dtype=float)
+
+    # Standing still adds no distance, np.interp needs each distance once
+    keep = np.unique(distance, return_index=True)[1]
+
+    channels = {
+        "Time": tel["Time"].dt.total_seconds().to_numpy(),
+        "Speed": tel["Speed"].to_numpy(dtype=float),
+        "Throttle": tel["Throttle"].to_numpy(dtype=float),
+        "Brake": tel["Brake"].to_numpy(dtype=float) * 100,
+        "RPM": tel["RPM"].to_numpy(dtype=float),
+        "nGear": tel["nGear"].to_numpy(dtype=float),
+        "DRS": tel["DRS"].to_numpy(dtype=float),
+    }
+    return distance[keep], {name: values[keep] for name, values in channels.items()}
+
+
+def align_laps(samples, step: float = DISTANCE_STEP_M):
+    """Resample laps onto a common distance grid in one pass.
+
+    The grid runs up to the shortest lap's distance so every lap covers it.
+    Laps are laid end to end on one distance axis, each shifted past the end
+    of the one before, so a single np.interp / searchsorted call per channel
+    handles the whole stack. Returns (distance grid, laps x channels x samples).
+    """
+    lengths = np.array([distance[-1] for distance, _ in samples])
+    grid = np.arange(0, lengths.min(), step)
+
+    offsets = np.arange(len(samples)) * (lengths.max() + step)
+    flat_distance = np.concatenate([distance + offset for (distance, _), offset in zip(samples, offsets)])
+    query = (grid[None, :] + offsets[:, None]).ravel()
+
+    data = np.empty((len(samples), len(CHANNELS), len(grid)))
+    for c, name in enumerate(INTERPOLATED_CHANNELS):
+        flat = np.concatenate([channels[name] for _, channels in samples])
+        data[:, c] = np.interp(query, flat_distance, flat).reshape(len(samples), -1)
+
+    indices = np.clip(np.searchsorted(flat_distance, query, side="right") - 1, 0, len(flat_distance) - 1)
+    for c, name in enumerate(STEPPED_CHANNELS, start=len(INTERPOLATED_CHANNELS)):
+        flat = np.concatenate([channels[name] for _, channels in samples])
+        data[:, c] = flat[indices].reshape(len(samples), -1)
+
+    return grid, data
+
+
+# -------------------- Public API --------------------
+
+def compare_laps(session, drivers=None, step: float = DISTANCE_STEP_M) -> LapComparison:
+    """Fastest laps of ``drivers`` (default: everyone with a timed lap) on one
+    distance grid, computed once per session and set of drivers"""
+    if drivers is None:
+        drivers = list(session.laps["Driver"].dropna().unique())
+    key = (tuple(drivers), float(step))
+
+    cache = _comparisons.setdefault(session, {})
+    comparison = cache.get(key)
+    if comparison is None:
+        codes, samples = [], []
+        for driver in drivers:
+            lap = session.laps.pick_drivers(driver).pick_fastest()
+            # Drivers without a timed lap are left out
+            if lap is None or lap.empty:
+                continue
+            codes.append(driver)
+            samples.append(lap_samples(lap))
+
+        if not samples:
+            raise ValueError(f"No timed laps for {', '.join(map(str, drivers))}")
+
+        distance, data = align_laps(samples, step)
+        comparison = cache[key] = LapComparison(codes, distance, data)
+    return comparison
+
+
+def lap_speed_table(session, laps=None) -> pd.DataFrame:
+    """Time-weighted mean speed and top speed (km/h) of every lap, in one pass.
+
+    Instead of merging telemetry lap by lap, each driver's car data is cut
+    into lap segments with searchsorted on the laps' start and end session
+    times, and all segments of all drivers are reduced together with
+    np.add.reduceat / np.maximum.reduceat. The mean speed integrates speed
+    over time (left Riemann sum) and divides by the segment's duration.
+    Laps with fewer than two samples get NaN. Rows are indexed like ``laps``.
+    """
+    if laps is None:
+        laps = session.laps
+
+    speed_parts, time_parts, starts, ends, rows = [], [], [], [], []
+    base = 0
+    for number, driver_laps in laps.groupby("DriverNumber", sort=False):
+        car = session.car_data.get(str(number))
+        if car is None or car.empty:
+            continue
+        time_ns = car["SessionTime"].to_numpy().astype("timedelta64[ns]").astype(np.int64)
+
+        lap_start = driver_laps["LapStartTime"].to_numpy().astype("timedelta64[ns]").astype(np.int64)
+        lap_end = driver_laps["Time"].to_numpy().astype("timedelta64[ns]").astype(np.int64)
+        known = ~(pd.isna(driver_laps["LapStartTime"]).to_numpy() | pd.isna(driver_laps["Time"]).to_numpy())
+
+        starts.append(base + np.searchsorted(time_ns, lap_start[known], side="left"))
+        ends.append(base + np.searchsorted(time_ns, lap_end[known], side="right"))
+        rows.append(driver_laps.index.to_numpy()[known])
+
+        speed_parts.append(car["Speed"].to_numpy(dtype=float))
+        time_parts.append(time_ns / 1e9)
+        base += len(time_ns)
+
+    table = pd.DataFrame(index=laps.index, columns=["MeanSpeed", "TopSpeed", "Samples"], dtype=float)
+    table.insert(0, "Driver", laps["Driver"])
+    table.insert(1, "Team", laps["Team"])
+    table.insert(2, "LapNumber", laps["LapNumber"])
+    if not rows:
+        return table
+
+    # One sentinel sample at the end keeps every reduceat index in range
+    speed = np.append(np.concatenate(speed_parts), 0.0)
+    time_s = np.append(np.concatenate(time_parts), np.nan)
+    starts, ends, rows = np.concatenate(starts), np.concatenate(ends), np.concatenate(rows)
+    samples = ends - starts
+    valid = samples >= 2
+
+    # reduceat over (start, end) pairs reduces speed[start:end] at even
+    # positions; the odd positions cover the gaps between laps and are dropped
+    bounds = np.column_stack([starts, ends]).ravel()
+
+    # Each sample's speed times the time until the next sample. The last
+    # sample of a lap is excluded below, so no product spans two laps.
+    weighted = np.append(speed[:-1] * np.diff(time_s), 0.0)
+    last = np.column_stack([starts, np.maximum(ends - 1, starts)]).ravel()
+    distance = np.add.reduceat(weighted, last)[::2]
+
+    duration = time_s[np.maximum(ends - 1, starts)] - time_s[starts]
+    top_speed = np.maximum.reduceat(speed, bounds)[::2]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        table.loc[rows, "MeanSpeed"] = np.where(valid, distance / duration, np.nan)
+    table.loc[rows, "TopSpeed"] = np.where(samples >= 1, top_speed, np.nan)
+    table.loc[rows, "Samples"] = samples
+    return table
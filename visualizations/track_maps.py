@@ -0,0 +1,198 @@
+"""Track maps: each circuit's outline and corner labels, and the PNG batch.
+
+``track_map(year, gp)`` gives the outline of the race's fastest lap rotated
+to the circuit's usual orientation, plus the numbered corners, as compact
+float32 arrays any view can reuse. Maps of finished races are kept in a
+disk cache, so a circuit is only computed once.
+
+Computing a map no longer loads the race's telemetry. Laps come from the
+shared session cache, and for FastF1 sessions only the position stream is
+fetched, not the much larger car data stream.
+
+``build_track_maps`` is the batch behind ``TrackDisplay``. It draws every
+circuit in the render process pool. A circuit is skipped when its PNG is
+newer than its cached map, and redrawn from the cached map without a
+session load when only the PNG is missing or outdated:
+
+    python -m visualizations.track_maps --year 2024
+    python -m visualizations.track_maps --force Monaco Italy
+"""
+import argparse
+import io
+import os
+
+import numpy as np
+
+from visualizations.data_requirements import uses, load_for
+from visualizations.disk_cache import DiskCache
+from visualizations.drawing import draw_track_map
+from visualizations.executor import get_section_executor, PROCESS
+from visualizations.fastf1_cache import enable_fastf1_cache
+from visualizations.sessions import session_is_historical
+
+# Bump whenever a map's arrays change, orphaning the cached ones
+TRACK_MAP_VERSION = "1"
+
+# Maps of finished races, keyed by (year, event)
+map_cache = DiskCache("track_maps", version=TRACK_MAP_VERSION, suffix=".npz")
+
+# Where the batch writes its PNGs
+STATIC_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+
+# Distance from a corner to its label, before rotation
+CORNER_LABEL_OFFSET = 1000
+
+
+# -------------------- Maps --------------------
+
+def rotate(xy, *, angle):
+    rot_mat = np.array([[np.cos(angle), np.sin(angle)],
+                        [-np.sin(angle), np.cos(angle)]])
+    return np.matmul(xy, rot_mat)
+
+
+def _lap_positions(session, lap) -> np.ndarray:
+    """X/Y of ``lap`` from the position stream alone, as an (n, 2) array"""
+    if not session.f1_api_support:
+        # Offline sessions come with their position data in memory
+        return lap.get_pos_data().loc[:, ("X", "Y")].to_numpy()
+
+    import fastf1._api
+
+    enable_fastf1_cache()
+    pos_data = fastf1._api.position_data(session.api_path)
+    # Same offset Session.t0_date is calculated with, from position data only
+    t0 = max((data["Date"] - data["Time"]).max() for data in pos_data.values()).round("ms")
+    pos = pos_data[lap["DriverNumber"]]
+    session_time = pos["Date"].dt.round("ms") - t0
+    on_lap = (session_time >= lap["LapStartTime"]) & (session_time <= lap["Time"])
+    return pos.loc[on_lap, ["X", "Y"]].to_numpy()
+
+
+# Position data is fetched by _lap_positions, not through the session cache
+@uses("laps")
+def track_map(year: int, gp: str) -> dict:
+    """Rotated outline and corners of the race's circuit, cached when final"""
+    key = (int(year), str(gp).strip().lower())
+    cached = map_cache.get(key)
+    if cached is not None:
+        return decode_track_map(cached)
+
+    race = load_for(track_map, year, gp, "R")
+    lap = race.laps.pick_fastest()
+    track_info = race.get_circuit_info()
+    if track_info is None:
+        raise ValueError(f"No circuit info for {year} {gp}")
+    track_angle = track_info.rotation / 180 * np.pi
+
+    track = rotate(_lap_positions(race, lap), angle=track_angle)
+
+    corners = track_info.corners
+    corner_xy = corners[["X", "Y"]].to_numpy(dtype=float)
+    offset_angles = corners["Angle"].to_numpy(dtype=float) / 180 * np.pi
+    # The offset vector [1000, 0] rotated by each corner's angle
+    offsets = np.column_stack([np.cos(offset_angles), np.sin(offset_angles)]) * CORNER_LABEL_OFFSET
+
+    tmap = {
+        "track": track.astype(np.float32),
+        "corner_xy": rotate(corner_xy, angle=track_angle).astype(np.float32),
+        "label_xy": rotate(corner_xy + offsets, angle=track_angle).astype(np.float32),
+        "corner_labels": np.array([f"{number}{letter}" for number, letter in
+                                   zip(corners["Number"], corners["Letter"])], dtype=str),
+        "title": np.array(race.event["Location"]),
+    }
+    if session_is_historical(year, gp, "R"):
+        map_cache.put(key, encode_track_map(tmap))
+    return tmap
+
+
+def encode_track_map(tmap: dict) -> bytes:
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **tmap)
+    return buf.getvalue()
+
+
+def decode_track_map(data: bytes) -> dict:
+    with np.load(io.BytesIO(data)) as arrays:
+        return {name: arrays[name] for name in arrays.files}
+
+
+def draw_map(tmap: dict) -> bytes:
+    corners = [
+        (str(label), cx, cy, lx, ly)
+        for label, (cx, cy), (lx, ly) in zip(tmap["corner_labels"], tmap["corner_xy"], tmap["label_xy"])
+    ]
+    return draw_track_map(tmap["track"][:, 0], tmap["track"][:, 1], corners, str(tmap["title"]))
+
+
+# -------------------- Batch --------------------
+
+def track_png_name(gp: str) -> str:
+    return f"{gp.lower()}_track.png"
+
+
+def _up_to_date(png_path: str, key) -> bool:
+    """True if the PNG was written after the map it was drawn from"""
+    try:
+        return os.path.getmtime(png_path) >= os.path.getmtime(map_cache.path(key))
+    except FileNotFoundError:
+        return False
+
+
+def render_track(year: int, gp: str, static_path: str = STATIC_PATH, force: bool = False):
+    """Draw one circuit's PNG unless it is up to date; ``(file name, status)``.
+
+    Runs in the render process pool.
+    """
+    filename = track_png_name(gp)
+    filepath = os.path.join(static_path, filename)
+    key = (int(year), str(gp).strip().lower())
+
+    if not force and _up_to_date(filepath, key):
+        return filename, "skipped"
+
+    if force:
+        map_cache.delete(key)
+    status = "redrawn" if os.path.exists(map_cache.path(key)) else "built"
+    png = draw_map(track_map(year, gp))
+
+    os.makedirs(static_path, exist_ok=True)
+    tmp = filepath + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(png)
+    os.replace(tmp, filepath)
+    return filename, status
+
+
+def build_track_maps(year: int, events, static_path: str = STATIC_PATH, force: bool = False) -> list:
+    """Draw every event's track PNG in the process pool; the files written or kept"""
+    executor = get_section_executor()
+    pending = {gp: executor.submit(PROCESS, render_track, year, gp, static_path, force) for gp in events}
+
+    saved_files = []
+    for gp, future in pending.items():
+        try:
+            filename, status = future.result()
+        except Exception as e:
+            print(f"Skipping {gp}: {e}")
+            continue
+        saved_files.append(filename)
+        print(f"{status:<8} {os.path.join(static_path, filename)}")
+    return saved_files
+
+
+def main(argv=None):
+    from visualizations.plots import tracks
+
+    parser = argparse.ArgumentParser(description="Draw the track map PNGs")
+    parser.add_argument("events", nargs="*", help="events to draw (default: the whole calendar)")
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--output", default=STATIC_PATH)
+    parser.add_argument("--force", action="store_true", help="rebuild maps and PNGs that are up to date")
+    args = parser.parse_args(argv)
+
+    build_track_maps(args.year, args.events or tracks, args.output, args.force)
+
+
+if __name__ == "__main__":
+    main()